@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def role_of(username):
+    """Role implied by the username prefix, as used for access control throughout the app."""
+    username = (username or '').lower()
+    if username.startswith('s'):
+        return 'student'
+    if username.startswith('t'):
+        return 'teacher'
+    if username.startswith('a'):
+        return 'admin'
+    return 'other'
+
+
+class ActivityLog:
+    """Write-behind log of user activity with hourly and daily rollups.
+
+    ``record`` only appends to an in-memory buffer, so logins and downloads
+    never wait on a database write. A background thread flushes the buffer
+    every ``flush_interval`` seconds: raw events are inserted in one batch and
+    the rollup counters they touch are incremented in the same transaction.
+    Reports read the rollups, which stay small however many events arrive.
+    Events beyond ``max_buffer`` between flushes are dropped and counted.
+    """
+
+    def __init__(self, db_path, flush_interval=5, max_buffer=100000, retention_days=90):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._buffer = deque()
+        self._max_buffer = max_buffer
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self.dropped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY, ts REAL NOT NULL, kind TEXT NOT NULL,
+                username TEXT, role TEXT, course TEXT
+            );
+            CREATE INDEX IF NOT EXISTS ix_events_ts ON events (ts);
+            CREATE TABLE IF NOT EXISTS rollups (
+                period TEXT NOT NULL, bucket INTEGER NOT NULL, kind TEXT NOT NULL, dim TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (period, bucket, kind, dim)
+            );
+            CREATE TABLE IF NOT EXISTS active_users (
+                day INTEGER NOT NULL, username TEXT NOT NULL, PRIMARY KEY (day, username)
+            );
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, kind, username=None, course=None):
+        with self._lock:
+            if len(self._buffer) >= self._max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append((time.time(), kind, username, role_of(username) if username else None, course))
+
+    def flush(self):
+        """Write buffered events and their rollups in one transaction; returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                events, self._buffer = self._buffer, deque()
+            rollups = Counter()
+            users = {}
+            for ts, kind, username, role, course in events:
+                # Logins are broken down by role; everything course-related by course
+                dim = role if kind.startswith('login') else course or ''
+                rollups['hour', int(ts // HOUR * HOUR), kind, dim] += 1
+                rollups['day', int(ts // DAY * DAY), kind, dim] += 1
+                if username and kind != 'login_failed':
+                    users[int(ts // DAY * DAY), username] = role
+            conn = self._connection()
+            try:
+                # Inside the try: a busy database must not lose the batch either
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT INTO events (ts, kind, username, role, course) VALUES (?, ?, ?, ?, ?)",
+                                 events)
+                for (day, username), role in users.items():
+                    # Count each user once per day, however many workers saw them
+                    if conn.execute("INSERT OR IGNORE INTO active_users (day, username) VALUES (?, ?)",
+                                    (day, username)).rowcount:
+                        rollups['day', day, 'active_users', role] += 1
+                conn.executemany("INSERT INTO rollups (period, bucket, kind, dim, count) VALUES (?, ?, ?, ?, ?) "
+                                 "ON CONFLICT(period, bucket, kind, dim) DO UPDATE SET count = count + excluded.count",
+                                 [key + (count,) for key, count in rollups.items()])
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Keep the batch for the next attempt rather than losing it, within the same bound
+                with self._lock:
+                    self._buffer.extendleft(reversed(events))
+                    while len(self._buffer) > self._max_buffer:
+                        self._buffer.pop()
+                        self.dropped += 1
+                raise
+            logging.debug(f"[ActivityLog.flush] Wrote {len(events)} event(s), {len(rollups)} rollup row(s)")
+            return len(events)
+
+    def purge(self):
+        """Drop raw events and per-user activity older than the retention period; rollups are kept."""
+        cutoff = time.time() - self.retention_days * DAY
+        conn = self._connection()
+        conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,))
+        conn.execute("DELETE FROM active_users WHERE day < ?", (cutoff,))
+
+    def rollup(self, period, kind, since):
+        """{bucket: {dim: count}} for one kind of event, oldest bucket first."""
+        result = {}
+        for bucket, dim, count in self._connection().execute(
+                "SELECT bucket, dim, count FROM rollups WHERE period = ? AND kind = ? AND bucket >= ? "
+                "ORDER BY bucket, dim", (period, kind, since)):
+            result.setdefault(bucket, {})[dim] = count
+        return result
+
+    def top(self, period, kind, since, limit=10):
+        """[(dim, total)] for ``kind`` since ``since``, largest first."""
+        return self._connection().execute(
+            "SELECT dim, SUM(count) AS total FROM rollups WHERE period = ? AND kind = ? AND bucket >= ? "
+            "GROUP BY dim ORDER BY total DESC LIMIT ?", (period, kind, since, limit)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            return {'buffered': len(self._buffer), 'dropped': self.dropped}
+
+
+def start_activity_flusher(log, purge_interval=DAY):
+    """Flush ``log`` every ``flush_interval`` seconds in a daemon thread, and once more at exit."""
+
+    def loop():
+        last_purge = float('-inf')
+        while True:
+            time.sleep(log.flush_interval)
+            try:
+                log.flush()
+                if time.monotonic() - last_purge > purge_interval:
+                    log.purge()
+                    last_purge = time.monotonic()
+            except Exception:
+                logging.exception("[start_activity_flusher] Activity flush failed")
+
+    atexit.register(log.flush)
+    thread = threading.Thread(target=loop, name='activity-flush', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,115 @@
+import logging
+import math
+import threading
+
+from flask import jsonify
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import ClosingIterator
+
+DEFAULT_CLASS = 'page'
+# Probes and metrics must answer even when every lane is full
+EXEMPT_ENDPOINTS = {'readyz', 'rate_limit_metrics', 'admission_metrics', 'cache_metrics'}
+
+
+def route_class(name):
+    """Put a view in admission class ``name``; None exempts it (e.g. long-lived SSE streams)."""
+    def decorator(f):
+        f.admission_class = name
+        return f
+    return decorator
+
+
+class _Lane:
+    def __init__(self, slots, queue_timeout):
+        self.slots = slots
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self.in_use = self.waiting = self.admitted = self.rejected = 0
+
+    def acquire(self):
+        with self._lock:
+            self.waiting += 1
+        admitted = self._semaphore.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if admitted:
+                self.in_use += 1
+                self.admitted += 1
+            else:
+                self.rejected += 1
+        return admitted
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._semaphore.release()
+
+    def snapshot(self):
+        return {'slots': self.slots, 'in_use': self.in_use, 'waiting': self.waiting,
+                'admitted': self.admitted, 'rejected': self.rejected}
+
+
+class AdmissionMiddleware:
+    """WSGI middleware giving each route class its own pool of concurrency slots.
+
+    A request waits up to its class's queue timeout for a slot and is
+    answered 503 with Retry-After otherwise, so a burst of uploads can only
+    saturate the upload lane while page renders keep their own slots. The
+    slot is held until the response body is closed, which covers streamed
+    downloads.
+
+    This is the only admission layer: uploads ('upload'), assignment
+    submissions ('submission') and chunk PUTs all queue here, before their
+    bodies are read, and their 503s with Retry-After come only from here.
+    Views must not add slot queues of their own on top of a lane; SSE
+    streams are exempt and capped by their own connection limit instead.
+    """
+
+    def __init__(self, wsgi_app, flask_app, classes):
+        self.wsgi_app = wsgi_app
+        self.flask_app = flask_app
+        self.lanes = {name: _Lane(slots, timeout) for name, (slots, timeout) in classes.items()}
+
+    def _lane_for(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            # 404s, 405s and redirects are cheap; count them as page requests
+            return self.lanes.get(DEFAULT_CLASS)
+        if endpoint in EXEMPT_ENDPOINTS:
+            return None
+        view = self.flask_app.view_functions.get(endpoint)
+        return self.lanes.get(getattr(view, 'admission_class', DEFAULT_CLASS))
+
+    def __call__(self, environ, start_response):
+        lane = self._lane_for(environ)
+        if lane is None:
+            return self.wsgi_app(environ, start_response)
+        if not lane.acquire():
+            logging.warning(f"[AdmissionMiddleware] Rejected {environ.get('PATH_INFO')}: lane saturated")
+            response = Response('The server is busy; please retry shortly.', 503, mimetype='text/plain',
+                                headers={'Retry-After': str(max(math.ceil(lane.queue_timeout), 1))})
+            return response(environ, start_response)
+        try:
+            body = self.wsgi_app(environ, start_response)
+        except BaseException:
+            lane.release()
+            raise
+        return ClosingIterator(body, [lane.release])
+
+
+def init_admission(app):
+    """Wrap the app in AdmissionMiddleware and add /metrics/admission."""
+    if not app.config.get('ADMISSION_ENABLED', True):
+        return None
+    middleware = AdmissionMiddleware(app.wsgi_app, app, app.config['ADMISSION_CLASSES'])
+    app.wsgi_app = middleware
+
+    @app.route('/metrics/admission')
+    def admission_metrics():
+        """Current occupancy and totals per admission class for this worker."""
+        return jsonify({name: lane.snapshot() for name, lane in middleware.lanes.items()})
+
+    return middleware
@@ -0,0 +1,262 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class TooManyConnections(Exception):
+    pass
+
+
+class AnnouncementBus:
+    """Fan-out of new announcements to Server-Sent Events subscribers.
+
+    Every announcement is appended to a small SQLite event log shared by all
+    worker processes. One relay thread per process tails the log and hands new
+    rows to that process's subscribers, so a post on any worker reaches every
+    connected client. Row ids double as SSE event ids for Last-Event-ID resume.
+    Each open stream occupies a server thread for as long as the client stays
+    connected, so ``max_connections`` must stay well below the thread pool.
+    Asynchronous streams (``stream(..., asynchronous=True)``, written by the
+    ASGI event loop; see async_bodies.py) hold no thread and are capped
+    separately by ``max_async_connections``.
+
+    Threaded streams need a server that gives each request its own thread:
+    the dev server, or gunicorn with ``--worker-class gthread --threads N``.
+    A sync gunicorn worker serves one request at a time, so a single stream
+    would take the whole worker.
+    """
+
+    def __init__(self, db_path, max_connections=8, max_async_connections=1000, poll_interval=1.0,
+                 retention=7 * 24 * 3600):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.max_async_connections = max_async_connections
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS announcement_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    course_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+        self._last_id = 0
+        self._relay = None
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    @property
+    def connection_count(self):
+        return len(self._subscribers)
+
+    def publish(self, course_id, data):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO announcement_events (course_id, payload, created_at) VALUES (?, ?, ?)",
+                         (course_id, json.dumps(data), time.time()))
+        # Deliver to this worker's subscribers now instead of at the next poll
+        self._wakeup.set()
+
+    def latest_id(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM announcement_events").fetchone()[0]
+
+    def events_since(self, last_id, course_ids):
+        placeholders = ','.join('?' * len(course_ids))
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT id, course_id, payload FROM announcement_events "
+                f"WHERE id > ? AND course_id IN ({placeholders}) ORDER BY id",
+                [last_id, *course_ids]).fetchall()
+
+    def subscribe(self, course_ids, asynchronous=False):
+        sink = _LoopQueue(maxsize=100) if asynchronous else queue.Queue(maxsize=100)
+        limit = self.max_async_connections if asynchronous else self.max_connections
+        with self._lock:
+            open_streams = sum(isinstance(s[1], _LoopQueue) == asynchronous for s in self._subscribers)
+            if open_streams >= limit:
+                raise TooManyConnections()
+            subscriber = (frozenset(course_ids), sink)
+            self._subscribers.add(subscriber)
+        self._ensure_relay()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _ensure_relay(self):
+        if self._relay is None or not self._relay.is_alive():
+            with self._lock:
+                if self._relay is None or not self._relay.is_alive():
+                    # Start from the current end of the log; older events are served by replay
+                    with self._connect() as conn:
+                        self._last_id = conn.execute(
+                            "SELECT COALESCE(MAX(id), 0) FROM announcement_events").fetchone()[0]
+                    self._relay = threading.Thread(target=self._relay_loop, name='announcement-relay', daemon=True)
+                    self._relay.start()
+
+    def _relay_loop(self):
+        last_prune = 0
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self._connect() as conn:
+                    rows = conn.execute("SELECT id, course_id, payload FROM announcement_events "
+                                        "WHERE id > ? ORDER BY id", (self._last_id,)).fetchall()
+                    if time.time() - last_prune > 3600:
+                        conn.execute("DELETE FROM announcement_events WHERE created_at < ?",
+                                     (time.time() - self.retention,))
+                        last_prune = time.time()
+            except sqlite3.Error:
+                logging.exception("[AnnouncementBus] Relay poll failed")
+                continue
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for row in rows:
+                self._last_id = row[0]
+                for course_ids, q in subscribers:
+                    if row[1] in course_ids:
+                        try:
+                            q.put_nowait(row)
+                        except queue.Full:
+                            # A stalled client; it can catch up with Last-Event-ID
+                            pass
+
+    def stream(self, course_ids, last_event_id=None, heartbeat=15, asynchronous=False):
+        """SSE body for one client. Raises TooManyConnections before anything is sent.
+
+        With ``asynchronous`` the body is an async iterator for the event loop
+        and holds no thread while it waits.
+        """
+        # Checked and registered in one locked step, while the caller can still answer 503
+        subscriber = self.subscribe(course_ids, asynchronous)
+
+        def generate():
+            sent_id = 0
+            yield 'retry: 5000\n\n'
+            # Subscribed first, so nothing published during the replay is missed
+            if last_event_id is not None:
+                for row in self.events_since(last_event_id, list(course_ids)):
+                    sent_id = row[0]
+                    yield self._format(row)
+            while True:
+                try:
+                    row = subscriber[1].get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                if row[0] > sent_id:
+                    sent_id = row[0]
+                    yield self._format(row)
+
+        async def generate_async():
+            sent_id = 0
+            yield 'retry: 5000\n\n'
+            if last_event_id is not None:
+                rows = await asyncio.get_running_loop().run_in_executor(
+                    None, self.events_since, last_event_id, list(course_ids))
+                for row in rows:
+                    sent_id = row[0]
+                    yield self._format(row)
+            while True:
+                try:
+                    row = await subscriber[1].get(timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': heartbeat\n\n'
+                    continue
+                if row[0] > sent_id:
+                    sent_id = row[0]
+                    yield self._format(row)
+
+        return _EventStream(self, subscriber, generate_async() if asynchronous else generate())
+
+    @staticmethod
+    def _format(row):
+        event_id, course_id, payload = row
+        return f"id: {event_id}\nevent: announcement\ndata: {payload}\n\n"
+
+
+class _LoopQueue:
+    """Subscriber queue filled by the relay thread and read on an asyncio event loop.
+
+    The loop is bound on the first ``get``; rows relayed before that are kept.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._loop = None
+        self._queue = None
+        self._early = []
+
+    def put_nowait(self, row):
+        with self._lock:
+            if self._loop is None:
+                if len(self._early) >= self.maxsize:
+                    raise queue.Full
+                self._early.append(row)
+                return
+        try:
+            self._loop.call_soon_threadsafe(self._put, row)
+        except RuntimeError:
+            # The loop has shut down; the stream is gone
+            pass
+
+    def _put(self, row):
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # A stalled client; it can catch up with Last-Event-ID
+            pass
+
+    async def get(self, timeout):
+        if self._queue is None:
+            with self._lock:
+                self._queue = asyncio.Queue(self.maxsize)
+                for row in self._early:
+                    self._queue.put_nowait(row)
+                self._early = []
+                self._loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+
+class _EventStream:
+    """Response body holding one subscription; closing it releases the subscription, even if never iterated.
+
+    Threaded servers iterate it with ``for`` and call ``close()``; the event
+    loop uses ``async for`` and ``aclose()`` on an asynchronous stream.
+    """
+
+    def __init__(self, bus, subscriber, body):
+        self._bus = bus
+        self._subscriber = subscriber
+        self._body = body
+
+    def __iter__(self):
+        return self._body
+
+    def __aiter__(self):
+        return self._body
+
+    def close(self):
+        if hasattr(self._body, 'close'):
+            self._body.close()
+        self._bus.unsubscribe(self._subscriber)
+
+    async def aclose(self):
+        await self._body.aclose()
+        self._bus.unsubscribe(self._subscriber)
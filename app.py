@@ -1,13 +1,28 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, session
+from flask import Flask, render_template, redirect, url_for, flash, request, session, Response, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_mail import Mail, Message
 from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer
-from datetime import timedelta
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import datetime, timedelta, timezone
 import os
+import json
+import random
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-import logging 
+from db_tuning import init_db_tuning, read_engine
+from assets import init_assets
+from compression import init_compression
+from warmup import init_warmup, warmup_task
+import async_bodies
+from announcement_events import AnnouncementBus, TooManyConnections
+from ratelimit import client_ip, init_rate_limits
+from admission import init_admission, route_class
+from server_sessions import init_server_sessions
+import logging
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,12 +30,21 @@ logging.basicConfig(level=logging.DEBUG)
 # Initialize Flask application
 app = Flask(__name__)
 app.config.from_object(Config)
+init_assets(app)
+init_compression(app)
+init_admission(app)
+init_server_sessions(app)
+if app.config['PROXY_FIX_HOPS']:
+    # Outermost, so rate limits and logs see the client's address rather than the proxy's
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'], x_proto=app.config['PROXY_FIX_HOPS'])
 
 # Initialize extensions
 db = SQLAlchemy(app)
+init_db_tuning(app, db)
 migrate = Migrate(app, db)
 mail = Mail(app)
 serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'])
+rate_limiter = init_rate_limits(app)
 
 # Database Models
 class User(db.Model):
@@ -41,6 +65,54 @@ class User(db.Model):
         logging.debug(f"[User.check_password] Checking password for user '{self.username}': {result}")
         return result
 
+class GradeItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.String(20), nullable=False, index=True)
+    name = db.Column(db.String(120), nullable=False)
+    kind = db.Column(db.String(20), nullable=False, default='assignment')  # assignment or test
+    max_score = db.Column(db.Float, nullable=False, default=100)
+    weight = db.Column(db.Float, nullable=False, default=0)
+    __table_args__ = (db.UniqueConstraint('course_id', 'name'),)
+
+class Score(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('grade_item.id', ondelete='CASCADE'), nullable=False)
+    student = db.Column(db.String(80), nullable=False, index=True)  # username
+    score = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.DateTime)
+    __table_args__ = (db.UniqueConstraint('item_id', 'student'),)
+
+class Submission(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.String(20), nullable=False)
+    assignment = db.Column(db.String(120), nullable=False)
+    student = db.Column(db.String(80), nullable=False)  # username
+    attempt = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    storage_key = db.Column(db.String(512), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    submitted_at = db.Column(db.DateTime, nullable=False)
+    # Covers both "latest attempt per student" and the next-attempt lookup
+    __table_args__ = (db.UniqueConstraint('course_id', 'assignment', 'student', 'attempt'),
+                      db.Index('ix_submission_student', 'student', 'course_id'))
+
+class NoteRevision(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.String(20), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    is_snapshot = db.Column(db.Boolean, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed JSON: all lines, or a delta
+    size = db.Column(db.Integer, nullable=False)
+    author = db.Column(db.String(80))
+    created_at = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (db.UniqueConstraint('course_id', 'revision'),)
+
+class GradebookRevision(db.Model):
+    # Bumped on every grade write; lets each worker tell whether its cached statistics are stale
+    course_id = db.Column(db.String(20), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+
 # --- Helper Functions ---
 def send_reset_email(user_email, reset_url):
     msg = Message('Password Reset Request',
@@ -51,17 +123,32 @@ def send_reset_email(user_email, reset_url):
 
 If you did not make this request, please ignore this email.
 '''
-    mail.send(msg)
+    # SMTP can take seconds; hand it off so the request thread is freed at once
+    mail_executor.submit(deliver_mail, msg)
+
+mail_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='mail')
+
+def deliver_mail(msg):
+    with app.app_context():
+        try:
+            mail.send(msg)
+        except Exception:
+            logging.exception(f"[deliver_mail] Failed to send '{msg.subject}' to {msg.recipients}")
 
 from functools import wraps
 from flask import abort
 
+def get_enrolled_courses(username):
+    # For demonstration, assuming we have a way to get student's enrolled courses
+    # Here, we simulate with a fixed list or fetch from user profile in real app
+    return ['PROG1001', 'ICT2002', 'OP3011', 'DBM2023']
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('login'))
-        return f(*args, **kwargs)
+        return app.ensure_sync(f)(*args, **kwargs)
     return decorated_function
 
 # --- Route Definitions ---
@@ -76,7 +163,7 @@ def role_required(role_prefix):
             if not username.startswith(role_prefix):
                 flash('Access denied: insufficient permissions.', 'danger')
                 return redirect(url_for('login'))
-            return f(*args, **kwargs)
+            return app.ensure_sync(f)(*args, **kwargs)
         return decorated_function
     return decorator
 
@@ -92,39 +179,96 @@ def upload_announcement():
         flash('All fields are required for announcements.', 'danger')
         return redirect(url_for('course_detail', course_id=course_id))
 
-    announcements_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id, 'announcements')
-    os.makedirs(announcements_dir, exist_ok=True)
-
     # Save announcement as a text file with timestamp
     import datetime
     timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
     filename = f"{timestamp}_{secure_filename(title)}.txt"
-    filepath = os.path.join(announcements_dir, filename)
-
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(f"Title: {title}\n\n{content}")
+    data = f"Title: {title}\n\n{content}".encode('utf-8')
+    usage_ledger.check(course_id, len(data), session['username'])
+    key = storage.put_bytes(f"{course_id}/announcements/{filename}", data, owner=session['username'])
+    process_course_file(course_id, key)
+    announcement_bus.publish(course_id, {'course_id': course_id, 'title': title,
+                                         'content': f"Title: {title}\n\n{content}"})
 
     flash('Announcement uploaded successfully.', 'success')
     return redirect(url_for('course_detail', course_id=course_id))
 
+# A threaded stream pins one of the server's threads, so at most half of them may serve SSE;
+# streams written by the event loop under asgi.py have their own, larger cap
+sse_max_connections = min(app.config['SSE_MAX_CONNECTIONS'], max(1, app.config['ASGI_WSGI_THREADS'] // 2))
+if sse_max_connections < app.config['SSE_MAX_CONNECTIONS']:
+    logging.warning(f"[announcement_stream] SSE_MAX_CONNECTIONS capped at {sse_max_connections} "
+                    f"to leave threads for other requests")
+announcement_bus = AnnouncementBus(app.config['EVENTS_DB_PATH'] or os.path.join(app.instance_path, 'events.db'),
+                                   max_connections=sse_max_connections,
+                                   max_async_connections=app.config['SSE_MAX_ASYNC_CONNECTIONS'])
+
+@app.route('/events/announcements')
+@route_class(None)
+@login_required
+def announcement_stream():
+    """Server-Sent Events stream of new announcements for the user's courses."""
+    course_ids = get_enrolled_courses(session.get('username', ''))
+    if request.args.get('course_id'):
+        course_ids = [request.args['course_id']]
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    # Under asgi.py the event loop writes the stream and no thread waits on it
+    asynchronous = async_bodies.available()
+    try:
+        events = announcement_bus.stream(course_ids, last_event_id, heartbeat=app.config['SSE_HEARTBEAT'],
+                                         asynchronous=asynchronous)
+    except TooManyConnections:
+        # EventSource gives up for good on a non-200 answer, so a full worker sends an empty stream
+        # instead: the browser reconnects after the retry delay and resumes from the id, missing nothing
+        resume_id = last_event_id if last_event_id is not None else announcement_bus.latest_id()
+        delay = int(app.config['SSE_BUSY_RETRY'] * random.uniform(0.5, 1.5) * 1000)
+        return Response(f"retry: {delay}\nid: {resume_id}\n\n", mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+    response = Response(events, mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return async_bodies.defer(response) if asynchronous else response
+
+@app.route('/events/announcements/recent')
+@login_required
+def recent_announcements():
+    """Announcements after ?after= for the user's courses; the polling fallback for browsers without a stream."""
+    course_ids = get_enrolled_courses(session.get('username', ''))
+    after = request.args.get('after', type=int)
+    if after is None:
+        # First poll: just where to start from
+        return jsonify({'events': [], 'last_id': announcement_bus.latest_id()})
+    rows = announcement_bus.events_since(after, course_ids)
+    return jsonify({'events': [json.loads(payload) for _, _, payload in rows],
+                    'last_id': rows[-1][0] if rows else after})
+
 @app.context_processor
 def inject_announcements():
-    def get_announcements(course_id):
-        announcements_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id, 'announcements')
-        announcements = []
-        if os.path.exists(announcements_dir):
-            files = sorted(os.listdir(announcements_dir), reverse=True)
-            for file in files:
-                filepath = os.path.join(announcements_dir, file)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                announcements.append(content)
-        return announcements
-    return dict(get_announcements=get_announcements)
+    return dict(get_announcements=read_announcements)
 
 import os
 from werkzeug.utils import secure_filename
-from flask import send_from_directory
+from flask import send_from_directory, jsonify
+from functools import partial
+import mimetypes
+from zipstream import stream_zip
+from storage import InvalidKey, create_storage
+from activity import ActivityLog, role_of, start_activity_flusher
+from fragment_cache import init_fragment_cache
+from sdn_bench import (PROBE_KINDS, TOPOLOGY_KINDS, BenchmarkError, BenchmarkRunner, ResultStore,
+                       available_launchers, parse_topology)
+from storage_usage import QuotaExceeded, UsageLedger, format_bytes, parse_quota_overrides, start_reconciliation
+from sharedcache import DatabaseGenerationStore, GenerationStore, SharedCache
+from catalog_api import init_catalog_api
+from chunked_upload import ChunkedUploadStore, UploadError, start_upload_gc
+from search_index import SearchIndex
+from previews import PreviewStore
+from submissions import SubmissionRegistry
+from notes_history import NotesHistory
+from gradebook import ITEM_KINDS, Gradebook, GradebookError, parse_grades_file, parse_grades_json
 
 UPLOAD_FOLDER = 'uploads/lectures'
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'ppt', 'pptx', 'txt'}
@@ -134,11 +278,133 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def create_generation_store():
+    if app.config['CACHE_GENERATIONS_BACKEND'] == 'database':
+        with app.app_context():
+            return DatabaseGenerationStore(db.engine)
+    return GenerationStore(app.config['CACHE_GENERATIONS_PATH'] or os.path.join(app.instance_path, 'generations.db'))
+
+# Per-worker caches kept coherent across workers through shared generation counters
+shared_cache = SharedCache(create_generation_store(),
+                           maxsize=app.config['SHARED_CACHE_SIZE'], default_ttl=app.config['SHARED_CACHE_TTL'])
+
+# Per-course and per-user byte counters, updated by every storage write (see storage_usage.py)
+usage_ledger = UsageLedger(app.config['STORAGE_USAGE_DB_PATH'] or os.path.join(app.instance_path, 'usage.db'),
+                           course_quota=app.config['STORAGE_COURSE_QUOTA'],
+                           user_quota=app.config['STORAGE_USER_QUOTA'],
+                           course_overrides=parse_quota_overrides(app.config['STORAGE_COURSE_QUOTAS']))
+
+# All uploaded course files go through this (local disk or S3, see storage.py)
+storage = create_storage(app.config, cache=shared_cache, usage=usage_ledger)
+
+# {% cache %} blocks in templates, shared by everyone with the same role (see fragment_cache.py)
+fragment_cache = init_fragment_cache(app, SharedCache(shared_cache.generations, maxsize=app.config['FRAGMENT_CACHE_SIZE'],
+                                                      default_ttl=app.config['SHARED_CACHE_TTL']),
+                                     lambda: role_of(session.get('username')) if has_request_context() else None)
+app.jinja_env.globals['storage_generation'] = storage.generation_key
+
+if app.config['STORAGE_RECONCILE_INTERVAL']:
+    start_reconciliation(usage_ledger, storage, app.config['STORAGE_RECONCILE_INTERVAL'])
+
+# Logins, downloads and course views, buffered and written in batches (see activity.py)
+activity_log = ActivityLog(app.config['ACTIVITY_DB_PATH'] or os.path.join(app.instance_path, 'activity.db'),
+                           flush_interval=app.config['ACTIVITY_FLUSH_INTERVAL'],
+                           max_buffer=app.config['ACTIVITY_MAX_BUFFER'],
+                           retention_days=app.config['ACTIVITY_RETENTION_DAYS'])
+start_activity_flusher(activity_log)
+
+@app.template_filter('utc')
+def format_utc(timestamp, fmt='%Y-%m-%d %H:%M'):
+    # Rollup buckets are aligned to UTC hours and days
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(fmt)
+
+@app.errorhandler(InvalidKey)
+def handle_invalid_key(e):
+    return 'Not Found', 404
+
+app.add_template_filter(format_bytes, 'filesize')
+
+@app.errorhandler(QuotaExceeded)
+def handle_quota_exceeded(e):
+    flash(e.message, 'danger')
+    return redirect(request.referrer or url_for('index'))
+
+# Allowance for multipart boundaries and form fields, so Content-Length alone never rejects a file that fits
+MULTIPART_OVERHEAD = 64 * 1024
+
+def check_upload_quota(course_id, filename=None):
+    # Refuses from the declared length before the body is read; the exact size is checked again once parsed.
+    # With the target filename known, the file it would replace is credited back as in the later check.
+    if course_id and request.content_length:
+        filename = secure_filename(filename or '')
+        usage_ledger.check(course_id, max(0, request.content_length - MULTIPART_OVERHEAD), session['username'],
+                           key=f"{course_id}/{filename}" if filename else None)
+
+def upload_size(file):
+    # The parsed upload is spooled to memory or a temp file, so its size is known before storing it
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def process_course_file(course_id, key, preview=False):
+    # Both read the file back through storage in the background
+    search_index.enqueue(key)
+    if preview:
+        preview_store.enqueue(course_id, key)
+
+def read_announcements(course_id):
+    def load():
+        prefix = f"{course_id}/announcements"
+        return [storage.get(f"{prefix}/{name}").decode('utf-8')
+                for name in sorted(storage.list(prefix), reverse=True)]
+    # Any upload to the course (on any worker) bumps its generation
+    return shared_cache.get_or_set(('announcements', course_id), [storage.generation_key(course_id)], load)
+
+def read_course_content(course_id):
+    """Returns the lecture file names and the lecture notes of a course."""
+    def load():
+        lecture_files = [name for name in storage.list(course_id)
+                         if name not in ('lecture_notes.txt', 'announcements', 'assignments')]
+        notes_key = f"{course_id}/lecture_notes.txt"
+        lecture_notes = storage.get(notes_key).decode('utf-8') if storage.exists(notes_key) else ''
+        return lecture_files, lecture_notes
+    return shared_cache.get_or_set(('course_content', course_id), [storage.generation_key(course_id)], load)
+
+# Blocking storage calls made by async views run here, so they can overlap
+io_executor = ThreadPoolExecutor(max_workers=app.config['ASYNC_IO_THREADS'], thread_name_prefix='async-io')
+
+def run_io(func, *args):
+    # Submitted right away, so the work overlaps with whatever the view does before awaiting
+    return asyncio.get_running_loop().run_in_executor(io_executor, partial(func, *args))
+
+@app.route('/metrics/cache')
+def cache_metrics():
+    """Hit/miss counts of this worker's shared cache and template fragment cache."""
+    return jsonify(dict(shared_cache.stats(), fragments=fragment_cache.stats()))
+
+search_index = SearchIndex(app.config['SEARCH_INDEX_PATH'] or os.path.join(app.instance_path, 'search.db'),
+                           storage, workers=app.config['SEARCH_WORKERS'])
+
+@app.route('/search')
+@login_required
+def search():
+    """Ranked search over lecture notes, announcements and uploaded documents."""
+    query = request.args.get('q', '').strip()
+    course_id = request.args.get('course_id') or None
+    results = search_index.search(query, course_id=course_id) if query else []
+    return render_template('search.html', query=query, course_id=course_id, results=results)
+
 @app.route('/upload_course_lecture', methods=['GET', 'POST'])
+@route_class('upload')
 @login_required
 @role_required('t')
 def upload_course_lecture():
     if request.method == 'POST':
+        # The form posts back to ?course_id=...&filename=..., so the quota can be checked before parsing it
+        check_upload_quota(request.args.get('course_id'), request.args.get('filename'))
         course_id = request.form.get('course_id')
         lecture_notes = request.form.get('lecture_notes')
         file = request.files.get('lecture_file')
@@ -147,52 +413,215 @@ def upload_course_lecture():
             flash('Course ID is required.', 'danger')
             return redirect(request.url)
 
-        # Create directory for course if not exists
-        course_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id)
-        os.makedirs(course_dir, exist_ok=True)
-
         filename = None
         if file and allowed_file(file.filename):
             filename = secure_filename(file.filename)
-            file.save(os.path.join(course_dir, filename))
+            usage_ledger.check(course_id, upload_size(file), session['username'], key=f"{course_id}/{filename}")
+            key = storage.put(f"{course_id}/{filename}", file.stream, owner=session['username'])
+            process_course_file(course_id, key, preview=True)
         elif file:
             flash('File type not allowed.', 'danger')
             return redirect(request.url)
 
-        # Save lecture notes to a text file
+        # Save lecture notes as a new revision
         if lecture_notes:
-            notes_path = os.path.join(course_dir, 'lecture_notes.txt')
-            with open(notes_path, 'w', encoding='utf-8') as f:
-                f.write(lecture_notes)
+            save_lecture_notes(course_id, lecture_notes)
 
         flash('Course lecture uploaded/modified successfully.', 'success')
         return redirect(url_for('course_detail', course_id=course_id))
 
     return render_template('upload_course_lecture.html')
 
+notes_history = NotesHistory(db, NoteRevision, snapshot_every=app.config['NOTES_SNAPSHOT_EVERY'])
+
+def save_lecture_notes(course_id, text):
+    notes_key = f"{course_id}/lecture_notes.txt"
+    usage_ledger.check(course_id, len(text.encode('utf-8')), session.get('username'), key=notes_key)
+    if not notes_history.head(course_id) and storage.exists(notes_key):
+        # Notes written before history was kept become revision 1
+        notes_history.save(course_id, storage.get(notes_key).decode('utf-8'), author=None)
+    revision = notes_history.save(course_id, text, session.get('username'))
+    # The current text stays in storage, where course pages, search and ZIP exports read it
+    key = storage.put_bytes(notes_key, text.encode('utf-8'), owner=session.get('username'))
+    process_course_file(course_id, key)
+    return revision
+
+@app.route('/course/<course_id>/notes/history')
+@login_required
+@role_required('t')
+def lecture_notes_history(course_id):
+    """Lists note revisions; ?rev=N shows one, ?from=A&to=B diffs two."""
+    revision = request.args.get('rev', type=int)
+    old, new = request.args.get('from', type=int), request.args.get('to', type=int)
+    return render_template('notes_history.html', course_id=course_id,
+                           revisions=notes_history.revisions(course_id),
+                           revision=revision,
+                           text=notes_history.get(course_id, revision) if revision else None,
+                           old=old, new=new,
+                           diff=notes_history.diff(course_id, old, new) if old and new else None)
+
+# --- Resumable chunked uploads for large lecture files ---
+
+upload_store = ChunkedUploadStore(app.config['UPLOAD_SESSION_FOLDER'],
+                                  app.config['UPLOAD_CHUNK_SIZE'],
+                                  app.config['UPLOAD_SESSION_TTL'])
+start_upload_gc(upload_store, app.config['UPLOAD_SESSION_GC_INTERVAL'])
+
+@app.errorhandler(UploadError)
+def handle_upload_error(e):
+    return jsonify({'error': e.message}), e.status
+
+@app.route('/api/uploads', methods=['POST'])
+@login_required
+@role_required('t')
+def create_upload_session():
+    """Starts a resumable upload; the client then PUTs numbered chunks."""
+    data = request.get_json(silent=True) or request.form
+    course_id = data.get('course_id')
+    filename = secure_filename(data.get('filename') or '')
+    try:
+        size = int(request.headers.get('Upload-Length') or data.get('size'))
+    except (TypeError, ValueError):
+        raise UploadError('A numeric size is required.')
+    if not course_id or not filename:
+        raise UploadError('Course ID and filename are required.')
+    if not allowed_file(filename):
+        raise UploadError('File type not allowed.')
+    try:
+        # Refuse before any chunk is sent rather than after the whole file has arrived
+        usage_ledger.check(course_id, size, session['username'], key=f"{course_id}/{filename}")
+    except QuotaExceeded as e:
+        raise UploadError(e.message, 413)
+    meta = upload_store.create(session['user_id'], course_id, filename, size, data.get('sha256'))
+    return jsonify(upload_store.status(meta)), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+@login_required
+@role_required('t')
+def upload_session_status(upload_id):
+    """Reports which chunks have arrived, so an interrupted client can resume."""
+    meta = upload_store.load(upload_id, session['user_id'])
+    return jsonify(upload_store.status(meta))
+
+@app.route('/api/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@route_class('upload')
+@login_required
+@role_required('t')
+def upload_chunk(upload_id, index):
+    meta = upload_store.load(upload_id, session['user_id'])
+    received = upload_store.write_chunk(meta, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+    return jsonify({'index': index, 'received': received})
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+@route_class('upload')
+@login_required
+@role_required('t')
+def complete_upload(upload_id):
+    """Assembles and verifies the chunks, then publishes the file to the course."""
+    meta = upload_store.load(upload_id, session['user_id'])
+    key = f"{meta['course_id']}/{meta['filename']}"
+
+    def recheck_quota():
+        # Other sessions may have finalized since this one was created
+        try:
+            usage_ledger.check(meta['course_id'], meta['size'], session['username'], key=key)
+        except QuotaExceeded as e:
+            raise UploadError(e.message, 413)
+
+    try:
+        key, sha256 = upload_store.assemble(meta, storage, key, owner=session['username'], check=recheck_quota)
+    except InvalidKey:
+        raise UploadError('Invalid course ID.')
+    process_course_file(meta['course_id'], key, preview=True)
+    return jsonify({'course_id': meta['course_id'], 'filename': meta['filename'],
+                    'size': meta['size'], 'sha256': sha256})
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+@role_required('t')
+def abort_upload(upload_id):
+    meta = upload_store.load(upload_id, session['user_id'])
+    upload_store.abort(meta)
+    return '', 204
+
 @app.route('/course/<course_id>')
 @login_required
-def course_detail(course_id):
-    course_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id)
-    lecture_files = []
-    lecture_notes = ''
-
-    if os.path.exists(course_dir):
-        for filename in os.listdir(course_dir):
-            # Exclude lecture notes file and announcements directory
-            if filename != 'lecture_notes.txt' and filename != 'announcements':
-                lecture_files.append(filename)
-        notes_path = os.path.join(course_dir, 'lecture_notes.txt')
-        if os.path.exists(notes_path):
-            with open(notes_path, 'r', encoding='utf-8') as f:
-                lecture_notes = f.read()
-
-    return render_template('course_detail.html', course_id=course_id, lecture_files=lecture_files, lecture_notes=lecture_notes)
+async def course_detail(course_id):
+    (lecture_files, lecture_notes), previews = await asyncio.gather(
+        run_io(read_course_content, course_id), run_io(preview_store.for_course, course_id))
+    return render_template('course_detail.html', course_id=course_id, lecture_files=lecture_files, lecture_notes=lecture_notes,
+                           previews=previews)
+
+preview_store = PreviewStore(app.config['PREVIEW_CACHE_DIR'] or os.path.join(app.instance_path, 'previews'),
+                             app.config['PREVIEW_DB_PATH'] or os.path.join(app.instance_path, 'previews.db'),
+                             storage, workers=app.config['PREVIEW_WORKERS'])
+
+def can_view_course(course_id):
+    # Students see only the courses they are enrolled in; staff see every course
+    username = session.get('username', '')
+    return role_of(username) != 'student' or course_id in get_enrolled_courses(username)
+
+@app.route('/course/<course_id>/previews/<filename>')
+@route_class('download')
+@login_required
+def preview_thumbnail(course_id, filename):
+    # Only thumbnails of this course's own files, so a hash seen elsewhere unlocks nothing
+    if not can_view_course(course_id) or preview_store.thumbnail_path(course_id, filename) is None:
+        abort(404)
+    # Named by content hash, so the bytes behind a URL never change
+    return send_from_directory(preview_store.cache_dir, filename, max_age=365 * 24 * 3600)
 
 @app.route('/uploads/lectures/<course_id>/<filename>')
+@route_class('download')
 @login_required
 def uploaded_file(course_id, filename):
-    return send_from_directory(os.path.join(app.config['UPLOAD_FOLDER'], course_id), filename)
+    key = f"{course_id}/{filename}"
+    activity_log.record('download', session.get('username'), course_id)
+    if storage.local_path(key) is not None and not async_bodies.available():
+        return send_from_directory(os.path.join(app.config['UPLOAD_FOLDER'], course_id), filename)
+    stat = storage.stat(key)
+    if stat is None:
+        abort(404)
+    # Relayed chunk by chunk rather than read into memory; under asgi.py by the event loop
+    response = Response(storage.stream(key), mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.content_length = stat.size
+    response.last_modified = stat.mtime
+    response.set_etag(stat.etag)
+    response = response.make_conditional(request)
+    return async_bodies.defer(response) if async_bodies.available() else response
+
+def storage_zip_entries(prefix, exclude=()):
+    # (arcname, size, mtime, open_file) for every object below prefix
+    return [(key[len(prefix) + 1:], st.size, st.mtime, partial(storage.open, key))
+            for key, st in storage.walk(prefix)
+            if not key[len(prefix) + 1:].startswith(exclude)]
+
+def zip_response(files, download_name):
+    # Streamed as it is built, so the first bytes go out immediately
+    response = Response(stream_zip(files), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return async_bodies.defer(response) if async_bodies.available() else response
+
+@app.route('/course/<course_id>/download_all')
+@route_class('download')
+@login_required
+def download_course_materials(course_id):
+    """Streams all lecture files and notes of a course as one ZIP."""
+    # Announcements and student submissions are not course materials
+    files = storage_zip_entries(course_id, exclude=('announcements/', 'assignments/'))
+    return zip_response(files, f"{secure_filename(course_id)}_materials.zip")
+
+@app.route('/course/<course_id>/assignments/download_all')
+@route_class('download')
+@login_required
+@role_required('t')
+def download_course_submissions(course_id):
+    """Streams the latest submission of every student as one ZIP."""
+    files = [(f"{secure_filename(s.assignment) or 'general'}/{s.student}/{s.filename}", s.size,
+              s.submitted_at.timestamp(), partial(storage.open, s.storage_key))
+             for s in submission_registry.latest(course_id)]
+    return zip_response(files, f"{secure_filename(course_id)}_submissions.zip")
 
 # Route for the Homepage
 @app.route('/')
@@ -784,6 +1213,24 @@ faculties = [
     }
 ]
 
+# Lookup tables over the faculties data, built once per worker
+catalog_index = {}
+
+def get_catalog_index():
+    if not catalog_index:
+        courses_by_code = {}
+        for faculty in faculties:
+            for level, courses_list in faculty['courses'].items():
+                for c in courses_list:
+                    # Keep the first match, as the old linear scan did
+                    courses_by_code.setdefault((faculty['name'].lower(), c['code'].lower()), (c, level))
+        catalog_index['courses'] = courses_by_code
+        catalog_index['faculties'] = {f['name'].lower(): f for f in faculties}
+    return catalog_index
+
+# Read-only JSON API over the same data
+init_catalog_api(app, faculties, shared_cache)
+
 # Route for the Courses Page
 @app.route('/courses')
 def courses():
@@ -796,7 +1243,7 @@ def faculty_courses(faculty_name):
     """Renders the courses for a specific faculty."""
     # Convert faculty_name from URL to match data keys
     faculty_key = faculty_name.replace('_', ' ').title()
-    selected_faculty = next((f for f in faculties if f['name'].lower() == faculty_key.lower()), None)
+    selected_faculty = get_catalog_index()['faculties'].get(faculty_key.lower())
     if not selected_faculty:
         # If faculty not found, redirect to courses page or show 404
         return redirect(url_for('courses'))
@@ -806,20 +1253,12 @@ def faculty_courses(faculty_name):
 @app.route('/public_course/<faculty_name>/<course_code>')
 def public_course_detail(faculty_name, course_code):
     faculty_key = faculty_name.replace('_', ' ').title()
-    selected_faculty = next((f for f in faculties if f['name'].lower() == faculty_key.lower()), None)
+    index = get_catalog_index()
+    selected_faculty = index['faculties'].get(faculty_key.lower())
     if not selected_faculty:
         return redirect(url_for('courses'))
-    # Search for course in all study levels
-    course = None
-    study_level = None
-    for level, courses_list in selected_faculty['courses'].items():
-        for c in courses_list:
-            if c['code'].lower() == course_code.lower():
-                course = c
-                study_level = level
-                break
-        if course:
-            break
+    # Look the course up across all study levels of the faculty
+    course, study_level = index['courses'].get((faculty_key.lower(), course_code.lower()), (None, None))
     if not course:
         return redirect(url_for('faculty_courses', faculty_name=faculty_name))
     return render_template('public_course_detail.html', faculty_name=selected_faculty['name'], course=course, study_level=study_level)
@@ -868,8 +1307,13 @@ app.config['SECRET_KEY'] = 'your-secret-key'  # Ensure this is set in your confi
 
 # Route for the Login Page
 @app.route('/login', methods=['GET', 'POST'])
+@route_class('auth')
 def login():
     """Handles user login."""
+    if request.method == 'POST':
+        # Throttle before any DB lookup or password hashing
+        rate_limiter.hit('login_ip', client_ip())
+        rate_limiter.hit('login_user', request.form.get('username', ''))
     form = LoginForm()
     if form.validate_on_submit():
         flash(f"Form submitted with username: {form.username.data}", "info")
@@ -881,6 +1325,7 @@ def login():
         
         if user and user.check_password(form.password.data):
             flash("Password check passed", "info")
+            activity_log.record('login', user.username)
             session['user_id'] = user.id
             session['username'] = user.username  # Store username in session for access control
             if form.remember.data:
@@ -903,32 +1348,83 @@ def login():
                 flash("Redirecting to index", "info")
                 return redirect(url_for('index'))
         else:
+            activity_log.record('login_failed', form.username.data)
             flash('Invalid username or password', 'danger')
     
     return render_template('login.html', form=form)
 
+gradebook = Gradebook(db, GradeItem, Score, GradebookRevision)
+
+def is_student():
+    return session.get('username', '').lower().startswith('s')
+
+def graded_items(course_id, kind):
+    # Items of one kind with class statistics, plus the student's own score when a student asks
+    items = [item for item in gradebook.statistics(course_id)['items'] if item['kind'] == kind]
+    if is_student():
+        own = {g['name']: g['score'] for g in gradebook.student_grades(course_id, session['username'])[0]}
+        items = [dict(item, score=own.get(item['name'])) for item in items]
+    return items
+
 @app.route('/grades/<course_id>')
 @login_required
 def grades(course_id):
-    # Placeholder: Fetch grades data for the course_id
-    grades_data = []  # Replace with actual data fetching logic
-    return render_template('grades.html', course_id=course_id, grades=grades_data)
+    stats = gradebook.statistics(course_id)
+    student_grades, student_total = [], None
+    if is_student():
+        student_grades, student_total = gradebook.student_grades(course_id, session['username'])
+    return render_template('grades.html', course_id=course_id, stats=stats, grades=student_grades,
+                           student_total=student_total, item_kinds=ITEM_KINDS)
+
+@app.route('/grades/<course_id>/items', methods=['POST'])
+@login_required
+@role_required('t')
+def add_grade_item(course_id):
+    try:
+        items, _ = parse_grades_json({'items': [request.form.to_dict()]})
+        gradebook.ingest(course_id, items=items)
+        flash(f"Grade item '{items[0]['name']}' saved.", 'success')
+    except GradebookError as e:
+        flash(e.message, 'danger')
+    return redirect(url_for('grades', course_id=course_id))
+
+@app.route('/grades/<course_id>/import', methods=['POST'])
+@login_required
+@role_required('t')
+def import_grades(course_id):
+    """Bulk-loads a whole class's marks from a CSV/JSON file or a JSON body, all or nothing."""
+    try:
+        if request.is_json:
+            items, scores = parse_grades_json(request.get_json(silent=True))
+        else:
+            file = request.files.get('grades_file')
+            if not file or not file.filename:
+                raise GradebookError('Choose a CSV or JSON file to import.')
+            items, scores = parse_grades_file(file.stream, file.filename)
+        result = gradebook.ingest(course_id, items, scores)
+    except GradebookError as e:
+        if request.is_json:
+            return jsonify({'error': e.message}), 400
+        flash(e.message, 'danger')
+        return redirect(url_for('grades', course_id=course_id))
+    if request.is_json:
+        return jsonify(result)
+    flash(f"Imported {result['scores']} score(s).", 'success')
+    return redirect(url_for('grades', course_id=course_id))
 
 @app.route('/tests/<course_id>')
 @login_required
 def tests(course_id):
-    # Placeholder: Fetch tests data for the course_id
-    tests_data = []  # Replace with actual data fetching logic
-    return render_template('tests.html', course_id=course_id, tests=tests_data)
+    return render_template('tests.html', course_id=course_id, tests=graded_items(course_id, 'test'))
 
 @app.route('/assignments/<course_id>')
 @login_required
 def assignments(course_id):
-    # Placeholder: Fetch assignments data for the course_id
-    assignments_data = []  # Replace with actual data fetching logic
-    return render_template('assignments.html', course_id=course_id, assignments=assignments_data)
+    return render_template('assignments.html', course_id=course_id,
+                           assignments=graded_items(course_id, 'assignment'))
 
 @app.route('/add_user', methods=['GET', 'POST'])
+@route_class('admin')
 @login_required
 @role_required('a')
 def add_user():
@@ -958,7 +1454,7 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return redirect(url_for('login'))
-        return f(*args, **kwargs)
+        return app.ensure_sync(f)(*args, **kwargs)
     return decorated_function
 
 def role_required(role_prefix):
@@ -968,77 +1464,78 @@ def role_required(role_prefix):
             username = session.get('username', '').lower()
             if not username.startswith(role_prefix):
                 abort(403)  # Forbidden
-            return f(*args, **kwargs)
+            return app.ensure_sync(f)(*args, **kwargs)
         return decorated_function
     return decorator
 
 @app.route('/student_home')
 @login_required
 @role_required('s')
-def student_home():
-    # For demonstration, assuming we have a way to get student's enrolled courses
-    # Here, we simulate with a fixed list or fetch from user profile in real app
-    enrolled_courses = ['PROG1001', 'ICT2002', 'OP3011', 'DBM2023']
+async def student_home():
+    enrolled_courses = get_enrolled_courses(session.get('username', ''))
 
-    # Collect announcements for all enrolled courses
+    # Read the announcements of all enrolled courses concurrently
+    per_course = await asyncio.gather(*(run_io(read_announcements, course_id) for course_id in enrolled_courses))
     all_announcements = []
-    for course_id in enrolled_courses:
-        announcements_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id, 'announcements')
-        if os.path.exists(announcements_dir):
-            files = sorted(os.listdir(announcements_dir), reverse=True)
-            for file in files:
-                filepath = os.path.join(announcements_dir, file)
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                all_announcements.append({'course_id': course_id, 'content': content})
+    for course_id, announcements in zip(enrolled_courses, per_course):
+        for content in announcements:
+            all_announcements.append({'course_id': course_id, 'content': content})
 
     return render_template('student_home.html', announcements=all_announcements)
 
 @app.route('/student_course/<course_id>')
 @login_required
 @role_required('s')
-def student_course_detail(course_id):
-    course_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id)
-    lecture_files = []
-    lecture_notes = ''
-    grades = []  # Fetch grades for student and course_id
-    tests = []   # Fetch tests for student and course_id
-
-    if os.path.exists(course_dir):
-        for filename in os.listdir(course_dir):
-            if filename != 'lecture_notes.txt' and filename != 'announcements':
-                lecture_files.append(filename)
-        notes_path = os.path.join(course_dir, 'lecture_notes.txt')
-        if os.path.exists(notes_path):
-            with open(notes_path, 'r', encoding='utf-8') as f:
-                lecture_notes = f.read()
-
-    # Placeholder: Fetch grades and tests data for the student and course_id
-    # Replace with actual data fetching logic
-
-    return render_template('student_course_detail.html', course_id=course_id, lecture_files=lecture_files, lecture_notes=lecture_notes, grades=grades, tests=tests)
+async def student_course_detail(course_id):
+    activity_log.record('course_view', session['username'], course_id)
+    content = asyncio.gather(run_io(read_course_content, course_id), run_io(preview_store.for_course, course_id))
+    # DB queries stay on this thread (the session belongs to the app context) while files are read
+    grades, grade_total = gradebook.student_grades(course_id, session['username'])
+    tests = [g for g in grades if g['kind'] == 'test']
+    (lecture_files, lecture_notes), previews = await content
+
+    return render_template('student_course_detail.html', course_id=course_id, lecture_files=lecture_files, lecture_notes=lecture_notes, grades=grades, tests=tests,
+                           grade_total=grade_total, assignments=[g for g in grades if g['kind'] == 'assignment'],
+                           submissions=submission_registry.history(course_id, session['username']),
+                           previews=previews)
+
+submission_registry = SubmissionRegistry(db, Submission, storage)
 
 @app.route('/upload_assignment', methods=['POST'])
+@route_class('submission')
 @login_required
 @role_required('s')
 def upload_assignment():
+    # The 'submission' admission lane already holds a slot for this request, taken before the body is read
+    check_upload_quota(request.args.get('course_id'))
     course_id = request.form.get('course_id')
+    assignment = (request.form.get('assignment') or 'general').strip()
     file = request.files.get('assignment_file')
 
     if not course_id or not file:
         flash('Course ID and assignment file are required.', 'danger')
         return redirect(request.referrer or url_for('student_home'))
 
-    assignments_dir = os.path.join(app.config['UPLOAD_FOLDER'], course_id, 'assignments')
-    os.makedirs(assignments_dir, exist_ok=True)
-
     filename = secure_filename(file.filename)
-    filepath = os.path.join(assignments_dir, filename)
-    file.save(filepath)
+    if not filename:
+        flash('Invalid assignment file name.', 'danger')
+        return redirect(request.referrer or url_for('student_home'))
+    usage_ledger.check(course_id, upload_size(file), session['username'])
+    submission = submission_registry.submit(course_id, assignment, session['username'], file.stream, filename)
 
-    flash('Assignment uploaded successfully.', 'success')
+    flash(f"Assignment uploaded successfully (attempt {submission.attempt}).", 'success')
     return redirect(url_for('student_course_detail', course_id=course_id))
 
+@app.route('/api/courses/<course_id>/submissions')
+@login_required
+@role_required('t')
+def list_submissions(course_id):
+    """Latest submission of every student, optionally for one assignment."""
+    return jsonify([{'assignment': s.assignment, 'student': s.student, 'attempt': s.attempt,
+                     'filename': s.filename, 'size': s.size, 'sha256': s.sha256,
+                     'submitted_at': s.submitted_at.isoformat()}
+                    for s in submission_registry.latest(course_id, request.args.get('assignment'))])
+
 @app.route('/teacher_home')
 @login_required
 @role_required('t')
@@ -1048,6 +1545,7 @@ def teacher_home():
     return render_template('teacher_home.html')
 
 @app.route('/admin_home')
+@route_class('admin')
 @login_required
 @role_required('a')
 def admin_home():
@@ -1060,13 +1558,45 @@ def documents():
     return render_template('documents.html')
 
 @app.route('/list_users')
+@route_class('admin')
 @login_required
 @role_required('a')
 def list_users():
-    users = User.query.all()
+    users = db.session.execute(
+        db.select(User), bind_arguments={'bind': read_engine(db)}
+    ).scalars().all()
     return render_template('list_users.html', users=users)
 
+@app.route('/admin/storage_usage')
+@route_class('admin')
+@login_required
+@role_required('a')
+def storage_usage():
+    """Disk use per course and per user, read from the usage counters rather than the upload tree."""
+    return render_template('storage_usage.html', courses=usage_ledger.report('course'),
+                           users=usage_ledger.report('user', limit=100))
+
+@app.route('/admin/activity')
+@route_class('admin')
+@login_required
+@role_required('a')
+def activity_report():
+    """Login, download and course-view reports, read from the rollup tables."""
+    now = time.time()
+    days = request.args.get('days', 14, type=int)
+    since = now - days * 24 * 3600
+    return render_template('activity_report.html', days=days,
+                           daily_logins=activity_log.rollup('day', 'login', since),
+                           daily_failed=activity_log.rollup('day', 'login_failed', since),
+                           daily_active=activity_log.rollup('day', 'active_users', since),
+                           hourly_logins=activity_log.rollup('hour', 'login', now - 24 * 3600),
+                           top_downloads=activity_log.top('day', 'download', since),
+                           top_views=activity_log.top('day', 'course_view', since),
+                           roles=('student', 'teacher', 'admin', 'other'),
+                           pipeline=activity_log.stats())
+
 @app.route('/logout')
+@route_class('auth')
 def logout():
     """Handles user logout."""
     session.pop('user_id', None)
@@ -1074,6 +1604,7 @@ def logout():
     return redirect(url_for('index'))
 
 @app.route('/start_mininet', methods=['POST'])
+@route_class('admin')
 @login_required
 @role_required('a')  # Or 't' if teachers should start it
 def start_mininet():
@@ -1086,6 +1617,7 @@ def start_mininet():
 
 
 @app.route('/stop_mininet', methods=['POST'])
+@route_class('admin')
 @login_required
 @role_required('a')
 def stop_mininet():
@@ -1094,13 +1626,57 @@ def stop_mininet():
     return redirect(url_for('admin_home'))
 
 
+# --- SDN-WAN lab benchmarks (see sdn_bench.py) ---
+
+sdn_results = ResultStore(app.config['SDN_BENCH_DB_PATH'] or os.path.join(app.instance_path, 'sdn_bench.db'))
+sdn_runner = BenchmarkRunner(sdn_results, available_launchers(app.config['SDN_BENCH_CONTROLLER']),
+                             parallel=app.config['SDN_BENCH_PARALLEL'])
+
+@app.route('/admin/sdn_bench', methods=['GET', 'POST'])
+@route_class('admin')
+@login_required
+@role_required('a')
+def sdn_bench():
+    """Starts benchmark runs and compares finished ones (?compare=<id>&compare=<id>)."""
+    if request.method == 'POST':
+        try:
+            topology = parse_topology(request.form, max_hosts=app.config['SDN_BENCH_MAX_HOSTS'])
+            duration = min(max(request.form.get('duration', 5, type=float), 1), app.config['SDN_BENCH_MAX_DURATION'])
+            run_id = sdn_runner.submit(topology, request.form.get('launcher', app.config['SDN_BENCH_LAUNCHER']),
+                                       request.form.getlist('probes') or PROBE_KINDS, duration,
+                                       request.form.get('label') or None)
+            flash(f"Benchmark run {run_id} started ({topology['name']}).", 'success')
+        except BenchmarkError as e:
+            flash(str(e), 'danger')
+        return redirect(url_for('sdn_bench'))
+    compare = request.args.getlist('compare', type=int)
+    return render_template('sdn_bench.html', runs=sdn_results.runs(), comparison=sdn_results.compare(compare),
+                           topologies=sdn_results.by_topology(), launchers=sorted(sdn_runner.launchers),
+                           default_launcher=app.config['SDN_BENCH_LAUNCHER'], kinds=TOPOLOGY_KINDS,
+                           probe_kinds=PROBE_KINDS)
+
+@app.route('/api/sdn_bench/runs/<int:run_id>')
+@login_required
+@role_required('a')
+def sdn_bench_run(run_id):
+    """One run with its per-pair statistics; ?samples=1 adds the raw sample columns."""
+    run = sdn_results.run(run_id)
+    if run is None:
+        abort(404)
+    run['pairs'] = sdn_results.pair_summary(run_id) if run['status'] == 'done' else []
+    if request.args.get('samples'):
+        run['samples'] = sdn_results.load(run_id)
+    return jsonify(run)
 
 # Route for the Forgot Password Page
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@route_class('auth')
 def forgot_password():
     """Handles password reset requests."""
     if request.method == 'POST':
         email = request.form.get('email')
+        rate_limiter.hit('reset_ip', client_ip())
+        rate_limiter.hit('reset_email', email or '')
         user = User.query.filter_by(email=email).first()
         
         if user:
@@ -1114,6 +1690,7 @@ def forgot_password():
     return render_template('forgot_password.html')
 
 @app.route('/reset-password/<token>', methods=['GET', 'POST'])
+@route_class('auth')
 def reset_password(token):
     """Handles password reset confirmation."""
     try:
@@ -1141,6 +1718,28 @@ def reset_password(token):
     
     return render_template('reset_password.html')
 
+# --- Worker Warm-up ---
+
+@warmup_task
+def open_db_connection(app):
+    db.session.execute(db.text('SELECT 1'))
+    db.session.remove()
+
+@warmup_task
+def build_catalog_index(app):
+    get_catalog_index()
+
+@warmup_task
+def prime_public_pages(app):
+    # Renders the public pages once so their compressed bodies are cached
+    client = app.test_client()
+    for path in ('/', '/courses', '/admissions', '/about', '/contact', '/login'):
+        # Closing the response releases its admission slot
+        with client.get(path, headers={'Accept-Encoding': 'gzip'}) as response:
+            response.get_data()
+
+init_warmup(app)
+
 # --- Run the Application ---
 
 # This block ensures the server only runs when the script is executed directly
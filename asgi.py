@@ -0,0 +1,17 @@
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    raise RuntimeError("asgi.py requires the a2wsgi package and an ASGI server: pip install a2wsgi uvicorn")
+
+from app import app
+from async_bodies import AsyncBodyMiddleware
+
+# ASGI entry point, e.g.: uvicorn asgi:application --workers 4
+# Flask views run on a pool of ASGI_WSGI_THREADS threads (async views included:
+# Flask runs them to completion on the same thread). What a slow client would
+# otherwise pin a thread for is done on the event loop instead: request bodies
+# are read into a temp file before the view runs, and downloads, ZIPs and
+# announcement streams are written after it returns (see async_bodies.py).
+# Bodies over ASGI_SPOOL_MAX_BYTES still stream through a thread.
+application = AsyncBodyMiddleware(app, WSGIMiddleware, spool_max_bytes=app.config['ASGI_SPOOL_MAX_BYTES'],
+                                  workers=app.config['ASGI_WSGI_THREADS'])
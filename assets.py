@@ -0,0 +1,57 @@
+import json
+import logging
+import mimetypes
+import os
+
+from flask import request, send_from_directory
+
+ASSET_DIST_DIR = 'dist'
+ASSET_MANIFEST = 'manifest.json'
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# (Accept-Encoding token, file suffix) in order of preference
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def load_manifest(static_folder):
+    """Map 'css/style.css' -> 'dist/css/style.<hash>.css' from the last build_static.py run."""
+    manifest_path = os.path.join(static_folder, ASSET_DIST_DIR, ASSET_MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def init_assets(app):
+    dist_dir = os.path.join(app.static_folder, ASSET_DIST_DIR)
+    manifest = load_manifest(app.static_folder)
+    if manifest:
+        logging.debug(f"[init_assets] Loaded {len(manifest)} fingerprinted assets")
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        # url_for('static', filename='css/style.css') -> /static/dist/css/style.<hash>.css
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def fingerprinted_static(filename):
+        """Serves a fingerprinted asset, preferring a precompressed variant."""
+        response = None
+        for encoding, suffix in PRECOMPRESSED_VARIANTS:
+            if request.accept_encodings[encoding] and os.path.exists(os.path.join(dist_dir, filename + suffix)):
+                response = send_from_directory(dist_dir, filename + suffix,
+                                               mimetype=mimetypes.guess_type(filename)[0],
+                                               download_name=os.path.basename(filename),
+                                               max_age=ASSET_MAX_AGE)
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(dist_dir, filename, max_age=ASSET_MAX_AGE)
+        response.vary.add('Accept-Encoding')
+        # The name changes whenever the content does, so browsers never need to revalidate
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.add_url_rule(f'{app.static_url_path}/{ASSET_DIST_DIR}/<path:filename>',
+                     'fingerprinted_static', fingerprinted_static)
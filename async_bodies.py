@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import tempfile
+
+from flask import request
+
+# Key in the ASGI scope (and so in environ['asgi.scope']) holding the request's hand-off slot
+SLOT = 'async_bodies'
+# Marks a response whose body the event loop writes; stripped before it reaches the client
+HEADER = 'X-Async-Body'
+READ_SIZE = 64 * 1024
+SPOOL_MEMORY = 1024 * 1024
+_DONE = object()
+
+
+def available():
+    """True when this request came through AsyncBodyMiddleware, so ``defer`` can be used."""
+    scope = request.environ.get('asgi.scope')
+    return scope is not None and SLOT in scope
+
+
+def defer(response):
+    """Hand ``response``'s body to the event loop; the view's thread is released once headers are set.
+
+    The body may be an iterable (each item is fetched on a short-lived
+    executor call) or an async iterable (awaited on the loop), of bytes or
+    str. Only call this when ``available()``.
+    """
+    request.environ['asgi.scope'][SLOT]['body'] = response.response
+    response.response = []
+    # Not a real empty body: keep the page ETag and compression hooks away from it
+    response.direct_passthrough = True
+    response.headers[HEADER] = '1'
+    return response
+
+
+async def _close(body, loop):
+    if hasattr(body, 'aclose'):
+        await body.aclose()
+    elif hasattr(body, 'close'):
+        await loop.run_in_executor(None, body.close)
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class AsyncBodyMiddleware:
+    """Serve ``wsgi_app`` over ASGI through ``adapter_class`` (e.g. a2wsgi) without parking threads on slow clients.
+
+    Request bodies up to ``spool_max_bytes`` are read on the event loop into
+    a temp file before the WSGI app runs, so a slow upload costs no thread.
+    Response bodies handed over with ``defer`` (downloads, ZIPs, SSE) are
+    written by the loop at the client's pace after the WSGI call returns;
+    the thread, and any admission slot, is free as soon as the view is done.
+    """
+
+    def __init__(self, wsgi_app, adapter_class, spool_max_bytes=256 * 1024 * 1024, **adapter_options):
+        self.wsgi_app = wsgi_app
+        self.spool_max_bytes = spool_max_bytes
+        # The adapter's threads run the app through _wsgi, which hands deferred bodies back
+        self.adapter = adapter_class(self._wsgi, **adapter_options)
+
+    def _wsgi(self, environ, start_response):
+        slot = environ['asgi.scope'][SLOT]
+
+        def capture_start_response(status, headers, exc_info=None):
+            slot['status'] = int(status.split(' ', 1)[0])
+            headers = [(name, value) for name, value in headers if name.lower() != HEADER.lower()]
+            return start_response(status, headers, exc_info)
+
+        body = self.wsgi_app(environ, capture_start_response)
+        if slot.get('body') is None:
+            return body
+        # The headers are out and the real body is the loop's job
+        if hasattr(body, 'close'):
+            body.close()
+        return []
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.adapter(scope, receive, send)
+        app_receive = await self._spool(scope, receive)
+        if app_receive is None:
+            return
+        slot = {}
+        scope = dict(scope, **{SLOT: slot})
+
+        async def relay(message):
+            # The adapter's own (empty) body for a deferred response is dropped
+            if message['type'] == 'http.response.body' and slot.get('body') is not None:
+                return
+            await send(message)
+
+        await self.adapter(scope, app_receive, relay)
+        body = slot.get('body')
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        if scope['method'] == 'HEAD' or slot.get('status') in (204, 304):
+            await _close(body, loop)
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await self._send_body(body, receive, send, loop)
+
+    async def _send_body(self, body, receive, send, loop):
+        disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+        if hasattr(body, '__aiter__'):
+            chunks = body.__aiter__()
+            fetch = chunks.__anext__
+        else:
+            chunks = iter(body)
+            fetch = lambda: loop.run_in_executor(None, next, chunks, _DONE)
+        try:
+            while True:
+                pending = asyncio.ensure_future(fetch())
+                await asyncio.wait({pending, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    # The client left; an async body is cancelled, a sync read finishes first
+                    if hasattr(body, '__aiter__'):
+                        pending.cancel()
+                    await asyncio.gather(pending, return_exceptions=True)
+                    return
+                try:
+                    chunk = pending.result()
+                except StopAsyncIteration:
+                    break
+                if chunk is _DONE:
+                    break
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            try:
+                await _close(body, loop)
+            except Exception:
+                logging.exception("[AsyncBodyMiddleware] Closing a deferred body failed")
+
+    async def _spool(self, scope, receive):
+        """A receive() that replays the request body from a temp file; None if the client left mid-body."""
+        headers = dict(scope['headers'])
+        length = headers.get(b'content-length')
+        if length in (None, b'0') and b'transfer-encoding' not in headers:
+            return receive
+        try:
+            if length is not None and int(length) > self.spool_max_bytes:
+                # Too big to buffer: the app reads it through a thread as it arrives
+                return receive
+        except ValueError:
+            return receive
+
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+        size = 0
+        more = True
+        while more and size <= self.spool_max_bytes:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                spool.close()
+                return None
+            data = message.get('body', b'')
+            spool.write(data)
+            size += len(data)
+            more = message.get('more_body', False)
+        spool.seek(0)
+        state = {'spooled': True}
+
+        async def replay():
+            if not state['spooled']:
+                return await receive()
+            data = spool.read(READ_SIZE)
+            if spool.tell() < size:
+                return {'type': 'http.request', 'body': data, 'more_body': True}
+            spool.close()
+            state['spooled'] = False
+            if more:
+                # Past spool_max_bytes: the rest streams straight from the client
+                message = await receive()
+                return dict(message, body=data + message.get('body', b''))
+            return {'type': 'http.request', 'body': data, 'more_body': False}
+
+        return replay
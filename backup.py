@@ -0,0 +1,304 @@
+"""Incremental, content-addressed snapshots of the database and the uploads.
+
+Each snapshot is a manifest under ``<backup dir>/snapshots``; file contents
+live once in ``<backup dir>/objects``, named by SHA-256. Uploads are read
+through the configured storage backend (local disk or S3, see storage.py),
+and files whose (size, ETag) match the previous snapshot reuse its hash
+without being read, so a nightly run reads and writes roughly the day's
+churn. The SQLite database is copied with the online backup API
+(consistent while workers write) and stored as fixed-size chunks, so
+unchanged pages are not stored again either. ``restore`` always writes a
+local tree, which can be served directly or copied back into a bucket.
+
+Usage:
+  python backup.py create [--database-only]
+  python backup.py list
+  python backup.py restore [SNAPSHOT | --at 2025-06-30T03:00] TARGET_DIR
+  python backup.py prune --keep 14
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+COPY_BUFFER_SIZE = 1024 * 1024
+DB_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+class BackupStore:
+    def __init__(self, root):
+        self.root = root
+        self.objects = os.path.join(root, 'objects')
+        self.snapshots = os.path.join(root, 'snapshots')
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.snapshots, exist_ok=True)
+        self.stats = {'hashed': 0, 'reused': 0, 'stored_bytes': 0}
+
+    @contextmanager
+    def lock(self):
+        """Keep two backup or prune runs from interleaving."""
+        with open(os.path.join(self.root, 'lock'), 'w') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise BackupError('Another backup is running')
+            yield
+
+    def object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def _store_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            os.replace(tmp_path, path)
+            self.stats['stored_bytes'] += len(data)
+        return digest
+
+    def store_file(self, src):
+        """Hash the file object ``src`` and copy it into the object store unless the content is already there."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects, suffix='.tmp')
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for block in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+                    digest.update(block)
+                    out.write(block)
+                    size += len(block)
+            digest = digest.hexdigest()
+            dest = self.object_path(digest)
+            if os.path.exists(dest):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+                self.stats['stored_bytes'] += size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.stats['hashed'] += 1
+        return digest
+
+    # --- Manifests ---
+
+    def manifest_ids(self):
+        return sorted(name[:-len('.json.gz')] for name in os.listdir(self.snapshots) if name.endswith('.json.gz'))
+
+    def load_manifest(self, snapshot_id):
+        path = os.path.join(self.snapshots, f"{snapshot_id}.json.gz")
+        if not os.path.exists(path):
+            raise BackupError(f"No snapshot '{snapshot_id}'")
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        # Written last and renamed into place, so a crashed run leaves no half snapshot behind
+        path = os.path.join(self.snapshots, f"{manifest['id']}.json.gz")
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def snapshot_at(self, moment):
+        """Latest snapshot taken at or before ``moment`` (a datetime): the point-in-time restore source."""
+        candidates = [i for i in self.manifest_ids() if i <= moment.strftime('%Y%m%dT%H%M%S')]
+        if not candidates:
+            raise BackupError(f"No snapshot at or before {moment.isoformat()}")
+        return candidates[-1]
+
+    # --- Snapshot ---
+
+    def backup_database(self, db_path):
+        """Consistent copy via the SQLite online backup API, stored as content-addressed chunks."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.db.tmp')
+        os.close(fd)
+        try:
+            source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            dest = sqlite3.connect(tmp_path)
+            try:
+                # Pages are copied in steps, so workers are only blocked briefly between them
+                source.backup(dest, pages=1024, sleep=0.01)
+            finally:
+                dest.close()
+                source.close()
+            chunks = []
+            with open(tmp_path, 'rb') as f:
+                for block in iter(lambda: f.read(DB_CHUNK_SIZE), b''):
+                    chunks.append(self._store_bytes(block))
+            return {'path': db_path, 'size': os.path.getsize(tmp_path), 'chunks': chunks}
+        finally:
+            os.remove(tmp_path)
+
+    def scan_storage(self, storage, previous):
+        """{key: [size, mtime_ns, etag, sha256]} for every object in ``storage``, hashing only changed ones."""
+        files = {}
+        for key, st in storage.walk(''):
+            old = previous.get(key)
+            if old and old[0] == st.size and old[2] == st.etag:
+                files[key] = old
+                self.stats['reused'] += 1
+                continue
+            try:
+                with storage.open(key) as src:
+                    digest = self.store_file(src)
+            except FileNotFoundError:
+                # Deleted between listing and reading
+                continue
+            files[key] = [st.size, int(st.mtime * 1e9), st.etag, digest]
+        return files
+
+    def create(self, db_path, storage=None):
+        with self.lock():
+            started = time.monotonic()
+            ids = self.manifest_ids()
+            previous = self.load_manifest(ids[-1]) if ids else {'files': {}}
+            snapshot_id = datetime.now().strftime('%Y%m%dT%H%M%S')
+            if ids and ids[-1] >= snapshot_id:
+                raise BackupError(f"Snapshot {snapshot_id} already exists")
+            manifest = {
+                'id': snapshot_id,
+                'created': time.time(),
+                'parent': ids[-1] if ids else None,
+                'database': self.backup_database(db_path) if db_path else None,
+                'upload_root': repr(storage) if storage else None,
+                'files': self.scan_storage(storage, previous['files']) if storage else {},
+            }
+            manifest['stats'] = dict(self.stats, seconds=round(time.monotonic() - started, 2))
+            self.save_manifest(manifest)
+            logging.info(f"[BackupStore.create] Snapshot {snapshot_id}: {len(manifest['files'])} files, "
+                         f"{self.stats['hashed']} hashed, {self.stats['reused']} unchanged, "
+                         f"{self.stats['stored_bytes']} new bytes")
+            return manifest
+
+    # --- Restore ---
+
+    def _materialize(self, digest, dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(self.object_path(digest), dest)
+
+    def restore(self, snapshot_id, target):
+        """Write the snapshot's database and upload tree under ``target`` (which must not exist)."""
+        manifest = self.load_manifest(snapshot_id)
+        if os.path.exists(target):
+            raise BackupError(f"{target} already exists; restore into a new directory")
+        uploads = os.path.join(target, 'uploads')
+        os.makedirs(uploads)
+        for rel, (size, mtime_ns, _, digest) in manifest['files'].items():
+            dest = os.path.join(uploads, *rel.split('/'))
+            self._materialize(digest, dest)
+            os.utime(dest, ns=(mtime_ns, mtime_ns))
+        database = manifest.get('database')
+        if database:
+            with open(os.path.join(target, os.path.basename(database['path'])), 'wb') as out:
+                for digest in database['chunks']:
+                    with open(self.object_path(digest), 'rb') as chunk:
+                        shutil.copyfileobj(chunk, out, COPY_BUFFER_SIZE)
+        return manifest
+
+    # --- Retention ---
+
+    def prune(self, keep):
+        """Delete all but the newest ``keep`` snapshots, then objects no remaining snapshot uses."""
+        if keep < 1:
+            raise BackupError('Keep at least one snapshot')
+        with self.lock():
+            ids = self.manifest_ids()
+            for snapshot_id in ids[:-keep]:
+                os.remove(os.path.join(self.snapshots, f"{snapshot_id}.json.gz"))
+            live = set()
+            for snapshot_id in self.manifest_ids():
+                manifest = self.load_manifest(snapshot_id)
+                live.update(entry[3] for entry in manifest['files'].values())
+                if manifest.get('database'):
+                    live.update(manifest['database']['chunks'])
+            removed = 0
+            with os.scandir(self.objects) as shards:
+                for shard in shards:
+                    if not shard.is_dir():
+                        continue
+                    with os.scandir(shard.path) as it:
+                        for entry in it:
+                            if shard.name + entry.name not in live:
+                                os.remove(entry.path)
+                                removed += 1
+            return removed
+
+
+def database_path(config, instance_path='instance'):
+    """Filesystem path of the app's SQLite database, or None for other engines."""
+    from sqlalchemy.engine import make_url
+    url = make_url(config.SQLALCHEMY_DATABASE_URI)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        return None
+    # Flask-SQLAlchemy resolves relative SQLite paths against the instance folder
+    return url.database if os.path.isabs(url.database) else os.path.join(instance_path, url.database)
+
+
+if __name__ == '__main__':
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Incremental snapshots of the database and uploads.')
+    parser.add_argument('--dir', default=Config.BACKUP_DIR, help='backup directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create')
+    create.add_argument('--database-only', action='store_true', help='skip the uploads')
+    commands.add_parser('list')
+    restore = commands.add_parser('restore')
+    restore.add_argument('snapshot', nargs='?')
+    restore.add_argument('target')
+    restore.add_argument('--at', help='restore the latest snapshot at or before this ISO time')
+    prune = commands.add_parser('prune')
+    prune.add_argument('--keep', type=int, default=Config.BACKUP_KEEP)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    store = BackupStore(args.dir)
+    try:
+        if args.command == 'create':
+            db_path = database_path(Config)
+            if db_path is None:
+                logging.warning("Database is not SQLite; back it up with its own tools")
+            storage = None
+            if not args.database_only:
+                from storage import create_storage
+                settings = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+                storage = create_storage(dict(settings, UPLOAD_FOLDER=Config.BACKUP_UPLOAD_FOLDER))
+            manifest = store.create(db_path, storage)
+            print(manifest['id'], json.dumps(manifest['stats']))
+        elif args.command == 'list':
+            for snapshot_id in store.manifest_ids():
+                manifest = store.load_manifest(snapshot_id)
+                print(f"{snapshot_id}  {len(manifest['files']):6d} files  "
+                      f"{sum(entry[0] for entry in manifest['files'].values()):12d} bytes  {json.dumps(manifest['stats'])}")
+        elif args.command == 'restore':
+            if args.at:
+                snapshot_id = store.snapshot_at(datetime.fromisoformat(args.at))
+            elif args.snapshot:
+                snapshot_id = args.snapshot
+            else:
+                parser.error('give a snapshot id or --at')
+            store.restore(snapshot_id, args.target)
+            print(f"Restored {snapshot_id} into {args.target}")
+        elif args.command == 'prune':
+            print(f"Removed {store.prune(args.keep)} unreferenced object(s)")
+    except BackupError as e:
+        parser.exit(1, f"backup: {e}\n")
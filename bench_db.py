@@ -0,0 +1,62 @@
+"""Compare concurrent SQLite writes with Python's sqlite3 defaults and the tuned Config profile.
+
+The baseline uses sqlite3.connect's own 5 second busy timeout and no pragmas,
+i.e. what the app did before the tuned profile.
+
+Usage: python bench_db.py [workers] [writes_per_worker]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from config import Config
+from db_tuning import apply_sqlite_pragmas
+
+TUNED = {key: getattr(Config, key) for key in dir(Config) if key.startswith('SQLITE_')}
+
+
+def _worker(args):
+    path, tuned, writes = args
+    locked = 0
+    conn = sqlite3.connect(path, timeout=Config.SQLITE_BUSY_TIMEOUT / 1000 if tuned else 5.0)
+    if tuned:
+        apply_sqlite_pragmas(conn, TUNED)
+    for i in range(writes):
+        try:
+            conn.execute("INSERT INTO user (username) VALUES (?)", (f"{os.getpid()}-{i}",))
+            conn.commit()
+        except sqlite3.OperationalError:
+            # "database is locked"
+            locked += 1
+            conn.rollback()
+    conn.close()
+    return locked
+
+
+def run(tuned, workers, writes):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE user (id INTEGER PRIMARY KEY, username TEXT UNIQUE)")
+        if tuned:
+            # journal_mode is stored in the file; switching it once here keeps workers from racing to do so
+            conn.execute(f"PRAGMA journal_mode = {Config.SQLITE_JOURNAL_MODE}")
+        conn.close()
+        start = time.perf_counter()
+        with Pool(workers) as pool:
+            locked = sum(pool.map(_worker, [(path, tuned, writes)] * workers))
+        elapsed = time.perf_counter() - start
+    total = workers * writes
+    label = 'tuned' if tuned else 'default'
+    print(f"{label:8} {total - locked:6d}/{total} writes ok, {locked:5d} locked, "
+          f"{elapsed:6.2f}s, {(total - locked) / elapsed:8.0f} writes/s")
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    run(False, workers, writes)
+    run(True, workers, writes)
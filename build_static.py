@@ -0,0 +1,77 @@
+"""Build fingerprinted, minified and precompressed copies of static/ into static/dist/.
+
+Run after changing anything under static/ and before deploying:
+    python build_static.py
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from assets import ASSET_DIST_DIR, ASSET_MANIFEST
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_FOLDER = os.path.join(STATIC_FOLDER, ASSET_DIST_DIR)
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.txt', '.json'}
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+
+def build_asset(relpath):
+    with open(os.path.join(STATIC_FOLDER, relpath), 'rb') as f:
+        data = f.read()
+    root, ext = os.path.splitext(relpath)
+    if ext == '.css':
+        data = minify_css(data.decode('utf-8')).encode('utf-8')
+
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    hashed = f"{root}.{digest}{ext}".replace(os.sep, '/')
+    out_path = os.path.join(DIST_FOLDER, hashed)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(data)
+
+    if ext in COMPRESSIBLE_EXTENSIONS:
+        with open(out_path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(out_path + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+    return hashed
+
+
+def build():
+    if os.path.exists(DIST_FOLDER):
+        shutil.rmtree(DIST_FOLDER)
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(STATIC_FOLDER):
+        if os.path.abspath(dirpath) == STATIC_FOLDER and ASSET_DIST_DIR in dirnames:
+            dirnames.remove(ASSET_DIST_DIR)
+        for filename in filenames:
+            relpath = os.path.relpath(os.path.join(dirpath, filename), STATIC_FOLDER)
+            manifest[relpath.replace(os.sep, '/')] = f"{ASSET_DIST_DIR}/{build_asset(relpath)}"
+
+    with open(os.path.join(DIST_FOLDER, ASSET_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    manifest = build()
+    for source, target in sorted(manifest.items()):
+        print(f"{source} -> {target}")
+    if brotli is None:
+        print("brotli is not installed; only gzip variants were written")
@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import json
+
+from flask import Response, abort, jsonify, request
+
+COURSE_FIELDS = ('faculty', 'level', 'code', 'name', 'description', 'credits', 'prerequisites',
+                 'learning_outcomes', 'assessment_methods', 'course_structure')
+DEFAULT_FIELDS = ('faculty', 'level', 'code', 'name', 'description', 'credits')
+MAX_PAGE_SIZE = 100
+CATALOG_GENERATION = 'catalog'
+
+
+class CatalogQueryError(Exception):
+    pass
+
+
+def flatten_catalog(faculties):
+    """One record per course, in catalog order, carrying its faculty and study level."""
+    records = []
+    for faculty in faculties:
+        for level, courses in faculty['courses'].items():
+            for course in courses:
+                records.append(dict(course, faculty=faculty['name'], level=level))
+    return records
+
+
+def _parse_fields(value):
+    if not value:
+        return DEFAULT_FIELDS
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = sorted(set(fields) - set(COURSE_FIELDS))
+    if unknown:
+        raise CatalogQueryError(f"Unknown field(s): {', '.join(unknown)}")
+    # Canonical order, so equivalent projections share one cached blob
+    return tuple(f for f in COURSE_FIELDS if f in fields)
+
+
+def _encode_cursor(record):
+    return base64.urlsafe_b64encode(f"{record['faculty']}|{record['code']}".encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (ValueError, UnicodeError):
+        raise CatalogQueryError('Invalid cursor')
+
+
+def _blob(payload):
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()
+
+
+def build_course_page(records, faculty=None, level=None, fields=DEFAULT_FIELDS, cursor=None, limit=20):
+    """Serialized page of courses matching the filters, resuming after ``cursor``."""
+    matches = [r for r in records
+               if (faculty is None or r['faculty'].lower() == faculty)
+               and (level is None or r['level'].lower() == level)]
+    start = 0
+    if cursor:
+        after = _decode_cursor(cursor)
+        positions = {f"{r['faculty']}|{r['code']}": i for i, r in enumerate(matches)}
+        if after not in positions:
+            raise CatalogQueryError('Invalid cursor')
+        start = positions[after] + 1
+    page = matches[start:start + limit]
+    has_more = start + limit < len(matches)
+    return _blob({
+        'items': [{f: r[f] for f in fields if f in r} for r in page],
+        'total': len(matches),
+        'next_cursor': _encode_cursor(page[-1]) if has_more and page else None,
+    })
+
+
+def init_catalog_api(app, faculties, cache):
+    """Add the read-only /api/catalog endpoints over ``faculties``.
+
+    Every distinct query is serialized once into a JSON byte blob with an
+    ETag and kept in ``cache`` (a SharedCache) until the 'catalog' generation
+    is bumped, so repeat hits only do a lookup and a conditional check.
+    """
+    records = flatten_catalog(faculties)
+    # Only known values reach a cache key, so arbitrary query strings can't grow the cache
+    known_faculties = {r['faculty'].lower() for r in records}
+    known_levels = {r['level'].lower() for r in records}
+    known_codes = {r['code'].lower() for r in records}
+
+    def parse_filter(name, known):
+        value = request.args.get(name, '').strip().lower() or None
+        if value is not None and value not in known:
+            raise CatalogQueryError(f'Unknown {name}: {value}')
+        return value
+
+    def blob_response(key, build):
+        body, etag = cache.get_or_set(('catalog_api',) + key, [CATALOG_GENERATION], build)
+        if body is None:
+            abort(404)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config.get('CATALOG_API_MAX_AGE', 300)
+        return response.make_conditional(request)
+
+    @app.route('/api/catalog')
+    def catalog_index():
+        """Entry point: the catalog's endpoints and the values their filters accept."""
+        return blob_response(('index',), lambda: _blob({
+            'faculties': '/api/catalog/faculties',
+            'courses': '/api/catalog/courses{?faculty,level,fields,cursor,limit}',
+            'course': '/api/catalog/courses/{code}{?faculty,fields}',
+            'filters': {'faculty': sorted({r['faculty'] for r in records}),
+                        'level': sorted({r['level'] for r in records})},
+            'fields': list(COURSE_FIELDS),
+            'total': len(records),
+        }))
+
+    @app.route('/api/catalog/faculties')
+    def catalog_faculties():
+        """Faculties with their study levels and course counts."""
+        return blob_response(('faculties',), lambda: _blob([
+            {'name': f['name'], 'icon': f['icon'], 'description': f['description'],
+             'levels': {level: len(courses) for level, courses in f['courses'].items()}}
+            for f in faculties]))
+
+    @app.route('/api/catalog/courses')
+    def catalog_courses():
+        """Courses filtered by ?faculty= and ?level=, projected with ?fields=, paged with ?cursor=&limit=."""
+        try:
+            fields = _parse_fields(request.args.get('fields'))
+            limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_PAGE_SIZE)
+            faculty = parse_filter('faculty', known_faculties)
+            level = parse_filter('level', known_levels)
+            cursor = request.args.get('cursor') or None
+            return blob_response(('courses', faculty, level, fields, cursor, limit),
+                                 lambda: build_course_page(records, faculty, level, fields, cursor, limit))
+        except CatalogQueryError as e:
+            return jsonify({'error': str(e)}), 400
+
+    @app.route('/api/catalog/courses/<code>')
+    def catalog_course(code):
+        """One course by code (?faculty= disambiguates codes shared between faculties)."""
+        try:
+            fields = _parse_fields(request.args.get('fields') or ','.join(COURSE_FIELDS))
+            faculty = parse_filter('faculty', known_faculties)
+        except CatalogQueryError as e:
+            return jsonify({'error': str(e)}), 400
+        if code.lower() not in known_codes:
+            abort(404)
+
+        def build():
+            for r in records:
+                if r['code'].lower() == code.lower() and (faculty is None or r['faculty'].lower() == faculty):
+                    return _blob({f: r[f] for f in fields if f in r})
+            return None, None
+
+        return blob_response(('course', code.lower(), faculty, fields), build)
@@ -0,0 +1,250 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Raised for client errors in the chunked upload protocol; carries an HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class ChunkedUploadStore:
+    """Resumable uploads kept as one directory per session under ``root``.
+
+    Every chunk is written to its own file, so chunks can arrive in any order
+    and in parallel. The session is assembled into the destination file only
+    when the client finalizes it; an ``assembling`` marker created with O_EXCL
+    lets exactly one finalize call (in any worker) do so. Chunk writes hold a
+    shared flock on the session while they publish, and the marker is only
+    created under the exclusive one, so no chunk lands once finalizing starts.
+    """
+
+    def __init__(self, root, chunk_size, ttl):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def _session_dir(self, upload_id):
+        # upload_id comes from the URL; only accept ids we could have generated
+        try:
+            upload_id = uuid.UUID(upload_id).hex
+        except ValueError:
+            raise UploadError('Unknown upload session.', 404)
+        return os.path.join(self.root, upload_id)
+
+    def _chunk_path(self, session_dir, index):
+        return os.path.join(session_dir, f"{index:08d}.part")
+
+    @staticmethod
+    def _assembling(session_dir):
+        return os.path.exists(os.path.join(session_dir, 'assembling'))
+
+    @staticmethod
+    @contextmanager
+    def _locked(session_dir, operation):
+        # Raises FileNotFoundError once the session directory is gone
+        with open(os.path.join(session_dir, 'lock'), 'a') as f:
+            fcntl.flock(f, operation)
+            yield
+
+    def create(self, owner_id, course_id, filename, size, sha256=None):
+        if size < 0:
+            raise UploadError('Upload size must not be negative.')
+        upload_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.root, upload_id)
+        os.makedirs(session_dir)
+        meta = {
+            'upload_id': upload_id,
+            'owner_id': owner_id,
+            'course_id': course_id,
+            'filename': filename,
+            'size': size,
+            'sha256': sha256.lower() if sha256 else None,
+            'chunk_size': self.chunk_size,
+            'chunk_count': max(1, -(-size // self.chunk_size)),
+            'created_at': time.time(),
+        }
+        with open(os.path.join(session_dir, 'session.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        return meta
+
+    def load(self, upload_id, owner_id):
+        session_dir = self._session_dir(upload_id)
+        try:
+            with open(os.path.join(session_dir, 'session.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            raise UploadError('Unknown upload session.', 404)
+        if meta['owner_id'] != owner_id:
+            raise UploadError('Unknown upload session.', 404)
+        return meta
+
+    def expected_chunk_length(self, meta, index):
+        if index == meta['chunk_count'] - 1:
+            return meta['size'] - index * meta['chunk_size']
+        return meta['chunk_size']
+
+    def write_chunk(self, meta, index, stream, sha256):
+        if not 0 <= index < meta['chunk_count']:
+            raise UploadError('Chunk index out of range.')
+        if not sha256:
+            raise UploadError('Missing X-Chunk-SHA256 header.')
+        expected = self.expected_chunk_length(meta, index)
+        session_dir = os.path.join(self.root, meta['upload_id'])
+        if self._assembling(session_dir):
+            raise UploadError('Upload is being finalized.', 409)
+        # Unique temp name, so concurrent retries of the same chunk cannot collide
+        tmp_path = os.path.join(session_dir, f"{index:08d}.{uuid.uuid4().hex}.tmp")
+        digest = hashlib.sha256()
+        received = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    block = stream.read(min(COPY_BUFFER_SIZE, expected - received + 1))
+                    if not block:
+                        break
+                    received += len(block)
+                    if received > expected:
+                        raise UploadError(f'Chunk {index} is larger than {expected} bytes.')
+                    digest.update(block)
+                    f.write(block)
+            if received != expected:
+                raise UploadError(f'Chunk {index} has {received} bytes, expected {expected}.')
+            if digest.hexdigest() != sha256.lower():
+                raise UploadError(f'Checksum mismatch for chunk {index}.', 422)
+            with self._locked(session_dir, fcntl.LOCK_SH):
+                # Checked again under the lock: finalizing may have started while the chunk arrived
+                if self._assembling(session_dir):
+                    raise UploadError('Upload is being finalized.', 409)
+                os.replace(tmp_path, self._chunk_path(session_dir, index))
+                os.utime(session_dir)
+        except FileNotFoundError:
+            # Finalized or aborted since the session was loaded
+            raise UploadError('Unknown upload session.', 404)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return received
+
+    def status(self, meta):
+        session_dir = os.path.join(self.root, meta['upload_id'])
+        try:
+            received = sorted(int(name.split('.', 1)[0]) for name in os.listdir(session_dir)
+                              if name.endswith('.part'))
+        except FileNotFoundError:
+            raise UploadError('Unknown upload session.', 404)
+        # Bytes received without gaps from the start, for clients that upload sequentially
+        offset_chunks = 0
+        for index in received:
+            if index != offset_chunks:
+                break
+            offset_chunks += 1
+        offset = sum(self.expected_chunk_length(meta, i) for i in range(offset_chunks))
+        return {
+            'upload_id': meta['upload_id'],
+            'size': meta['size'],
+            'chunk_size': meta['chunk_size'],
+            'chunk_count': meta['chunk_count'],
+            'received_chunks': received,
+            'missing_chunks': sorted(set(range(meta['chunk_count'])) - set(received)),
+            'offset': offset,
+        }
+
+    def assemble(self, meta, storage, key, owner=None, check=None):
+        """Concatenate the chunks, verify the whole file, store it under ``key`` and drop the session.
+
+        ``check``, if given, runs once the session is marked as finalizing and
+        before anything is copied; it refuses the upload by raising (e.g. a
+        quota check against usage that other uploads added since ``create``).
+        """
+        session_dir = os.path.join(self.root, meta['upload_id'])
+        marker = os.path.join(session_dir, 'assembling')
+        try:
+            with self._locked(session_dir, fcntl.LOCK_EX):
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # A retried finalize while the first is still running
+            raise UploadError('Upload is already being finalized.', 409)
+        except FileNotFoundError:
+            raise UploadError('Unknown upload session.', 404)
+
+        tmp_path = None
+        digest = hashlib.sha256()
+        try:
+            # No chunk can arrive from here on, so what is missing now stays missing
+            missing = self.status(meta)['missing_chunks']
+            if missing:
+                raise UploadError(f'{len(missing)} chunk(s) still missing.', 409)
+            if check is not None:
+                check()
+            fd, tmp_path = tempfile.mkstemp(dir=session_dir, suffix='.assembled.tmp')
+            with os.fdopen(fd, 'wb') as out:
+                for index in range(meta['chunk_count']):
+                    with open(self._chunk_path(session_dir, index), 'rb') as part:
+                        while True:
+                            block = part.read(COPY_BUFFER_SIZE)
+                            if not block:
+                                break
+                            digest.update(block)
+                            out.write(block)
+            if os.path.getsize(tmp_path) != meta['size']:
+                raise UploadError('Assembled file size does not match.', 422)
+            if meta['sha256'] and digest.hexdigest() != meta['sha256']:
+                raise UploadError('Checksum mismatch for assembled file.', 422)
+            key = storage.put_file(key, tmp_path, owner=owner)
+        except BaseException:
+            # Let the client fix the problem and finalize again
+            os.remove(marker)
+            raise
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return key, digest.hexdigest()
+
+    def abort(self, meta):
+        shutil.rmtree(os.path.join(self.root, meta['upload_id']), ignore_errors=True)
+
+    def collect_garbage(self, now=None):
+        """Remove sessions that have not received a chunk within ``ttl`` seconds."""
+        now = now or time.time()
+        removed = 0
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False) and now - entry.stat().st_mtime > self.ttl:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+        if removed:
+            logging.info(f"[ChunkedUploadStore.collect_garbage] Removed {removed} abandoned upload session(s)")
+        return removed
+
+
+def start_upload_gc(store, interval):
+    """Run ``store.collect_garbage`` every ``interval`` seconds in a daemon thread."""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                store.collect_garbage()
+            except Exception:
+                logging.exception("[start_upload_gc] Upload session cleanup failed")
+
+    thread = threading.Thread(target=loop, name='upload-gc', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,213 @@
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import request
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+
+from async_bodies import HEADER as ASYNC_BODY_HEADER
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+class CompressedBodyCache:
+    """Thread-safe LRU of compressed bodies, bounded by total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def _new_compressor(encoding, level):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses text responses according to Accept-Encoding.
+
+    Bodies are compressed chunk by chunk as the application yields them. When a
+    response carries an ETag and may be cached, the compressed body is kept in a
+    bounded cache so the next request for the same ETag skips compression.
+    """
+
+    def __init__(self, wsgi_app, min_size=500, level=6, cache_max_bytes=32 * 1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.level = level
+        self.cache = CompressedBodyCache(cache_max_bytes)
+
+    def choose_encoding(self, environ):
+        accept = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and accept['br']:
+            return 'br'
+        if accept['gzip']:
+            return 'gzip'
+        return None
+
+    def should_compress(self, environ, status, headers):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or not status.startswith('200'):
+            return False
+        if ASYNC_BODY_HEADER in headers:
+            # The event loop writes this body later, past this middleware (see async_bodies.py)
+            return False
+        if 'Content-Encoding' in headers:
+            # Precompressed static assets, or anything the view already encoded
+            return False
+        content_type = headers.get('Content-Type', '')
+        if content_type.startswith('text/event-stream'):
+            # Compressors buffer output, which would hold back pushed events
+            return False
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            # Uploaded PDF/PPTX/DOCX files are already compressed containers
+            return False
+        if 'no-transform' in parse_cache_control_header(headers.get('Cache-Control')):
+            return False
+        length = headers.get('Content-Length', type=int)
+        return length is None or length >= self.min_size
+
+    def cache_key(self, environ, headers, encoding):
+        etag = headers.get('ETag')
+        if not etag:
+            return None
+        cache_control = parse_cache_control_header(headers.get('Cache-Control'))
+        if cache_control.no_store:
+            return None
+        return (environ.get('PATH_INFO'), etag, encoding)
+
+    def __call__(self, environ, start_response):
+        encoding = self.choose_encoding(environ)
+        if encoding is None:
+            return self.wsgi_app(environ, start_response)
+
+        # Clients revalidate with the encoded ETag; the app only knows the identity one
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            for suffix in ('-br"', '-gzip"'):
+                if_none_match = if_none_match.replace(suffix, '"')
+            environ['HTTP_IF_NONE_MATCH'] = if_none_match
+
+        captured = {}
+
+        def capture_start_response(status, response_headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = Headers(response_headers)
+            captured['exc_info'] = exc_info
+            return lambda data: None
+
+        app_iter = self.wsgi_app(environ, capture_start_response)
+        status = captured['status']
+        headers = captured['headers']
+
+        if not self.should_compress(environ, status, headers):
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return app_iter
+
+        key = self.cache_key(environ, headers, encoding)
+        headers.remove('Content-Length')
+        headers['Content-Encoding'] = encoding
+        headers.add('Vary', 'Accept-Encoding')
+        if headers.get('ETag'):
+            # Distinguish the encoded representation from the identity one
+            etag = headers['ETag']
+            headers['ETag'] = f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+        if key is not None:
+            body = self.cache.get(key)
+            if body is not None:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+                headers['Content-Length'] = str(len(body))
+                start_response(status, headers.to_wsgi_list())
+                return [body]
+
+        start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+        return self.stream(app_iter, encoding, key)
+
+    def stream(self, app_iter, encoding, key):
+        compress, finish = _new_compressor(encoding, self.level)
+        parts = [] if key is not None else None
+        try:
+            for chunk in app_iter:
+                data = compress(chunk)
+                if data:
+                    if parts is not None:
+                        parts.append(data)
+                    yield data
+            data = finish()
+            if parts is not None:
+                parts.append(data)
+                self.cache.put(key, b''.join(parts))
+            yield data
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def init_compression(app):
+    """Tag rendered pages with ETags and wrap the WSGI app with CompressionMiddleware."""
+
+    @app.after_request
+    def add_page_etag(response):
+        # Hashing a buffered page is much cheaper than compressing it, and the ETag
+        # lets the middleware reuse an earlier compressed copy of identical content.
+        if (request.method == 'GET' and response.status_code == 200
+                and not response.direct_passthrough and not response.is_streamed
+                and response.mimetype in ('text/html', 'application/json')
+                and 'ETag' not in response.headers):
+            response.add_etag()
+            response.make_conditional(request)
+        return response
+
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config['COMPRESS_MIN_SIZE'],
+        level=app.config['COMPRESS_LEVEL'],
+        cache_max_bytes=app.config['COMPRESS_CACHE_MAX_BYTES'],
+    )
+    logging.debug(f"[init_compression] Response compression enabled (brotli={'yes' if brotli else 'no'})")
+    return app.wsgi_app
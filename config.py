@@ -11,6 +11,32 @@ class Config:
     # Database settings
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or 'sqlite:///university.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool settings (shared by the primary and replica engines)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+    if SQLALCHEMY_DATABASE_URI not in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory SQLite uses a static pool that takes no sizing options
+        SQLALCHEMY_ENGINE_OPTIONS.update({
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+        })
+
+    # SQLite pragmas, applied to every new connection (see db_tuning.py)
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -16000))  # negative means KiB
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+
+    # Optional read-only replica used for list/report queries
+    READ_REPLICA_URL = os.getenv('READ_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': READ_REPLICA_URL} if READ_REPLICA_URL else {}
     
     # Email settings
     MAIL_SERVER = os.getenv('MAIL_SERVER')
@@ -20,5 +46,123 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER') or 'noreply@alphauniversity.edu'
     
+    # Response compression (see compression.py)
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+    # Worker warm-up (see warmup.py)
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() in ['true', 'on', '1']
+    JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR')  # defaults to instance/jinja_cache
+
+    # Resumable chunked uploads (see chunked_upload.py)
+    UPLOAD_SESSION_FOLDER = os.getenv('UPLOAD_SESSION_FOLDER', 'uploads/sessions')
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_SESSION_TTL = int(os.getenv('UPLOAD_SESSION_TTL', 24 * 3600))  # seconds since last chunk
+    UPLOAD_SESSION_GC_INTERVAL = int(os.getenv('UPLOAD_SESSION_GC_INTERVAL', 3600))
+
+    # Full-text search over course content (see search_index.py)
+    SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH')  # defaults to instance/search.db
+    SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', 2))
+
+    # Server-Sent Events for announcements (see announcement_events.py)
+    EVENTS_DB_PATH = os.getenv('EVENTS_DB_PATH')  # defaults to instance/events.db
+    # Threaded streams need a threaded server (gunicorn --worker-class gthread); asgi.py needs no thread per stream
+    SSE_MAX_CONNECTIONS = int(os.getenv('SSE_MAX_CONNECTIONS', 8))  # per worker, for streams that hold a server thread
+    SSE_MAX_ASYNC_CONNECTIONS = int(os.getenv('SSE_MAX_ASYNC_CONNECTIONS', 1000))  # per worker under asgi.py; no thread each
+    SSE_HEARTBEAT = int(os.getenv('SSE_HEARTBEAT', 15))  # seconds
+    SSE_BUSY_RETRY = int(os.getenv('SSE_BUSY_RETRY', 30))  # seconds (jittered) before a client turned away at the cap reconnects
+
+    # Lecture file previews (see previews.py)
+    PREVIEW_CACHE_DIR = os.getenv('PREVIEW_CACHE_DIR')  # defaults to instance/previews
+    PREVIEW_DB_PATH = os.getenv('PREVIEW_DB_PATH')  # defaults to instance/previews.db, outside the served cache dir
+    PREVIEW_WORKERS = int(os.getenv('PREVIEW_WORKERS', 2))
+
+    # Storage backend for uploaded course files (see storage.py)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')  # 'local' or 's3'
+    STORAGE_LIST_CACHE_TTL = int(os.getenv('STORAGE_LIST_CACHE_TTL', 30))  # seconds
+    S3_BUCKET = os.getenv('S3_BUCKET')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'lectures')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')  # e.g. http://localhost:9000 for MinIO, or file:///srv/objects for a local object store
+    S3_REGION = os.getenv('S3_REGION')
+
+    # Login and password-reset throttling (see ratelimit.py); rates are 'attempts/seconds'
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
+    PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', 0))  # reverse proxies trusted for X-Forwarded-For/-Proto; 0 trusts none
+    RATELIMIT_STORAGE = os.getenv('RATELIMIT_STORAGE', 'sqlite')  # 'sqlite' (shared by workers) or 'memory'
+    RATELIMIT_DB_PATH = os.getenv('RATELIMIT_DB_PATH')  # defaults to instance/ratelimit.db
+    RATELIMIT_LOGIN_IP = os.getenv('RATELIMIT_LOGIN_IP', '20/60')
+    RATELIMIT_LOGIN_USER = os.getenv('RATELIMIT_LOGIN_USER', '5/300')
+    RATELIMIT_RESET_IP = os.getenv('RATELIMIT_RESET_IP', '5/300')
+    RATELIMIT_RESET_EMAIL = os.getenv('RATELIMIT_RESET_EMAIL', '3/3600')
+
+    # Admission control (see admission.py): concurrent slots per worker and seconds to queue before 503
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    ADMISSION_CLASSES = {
+        'upload': (int(os.getenv('ADMISSION_UPLOAD_SLOTS', 4)), float(os.getenv('ADMISSION_UPLOAD_TIMEOUT', 10))),
+        # Assignment submissions: more slots and a longer queue to absorb deadline rushes
+        'submission': (int(os.getenv('ADMISSION_SUBMISSION_SLOTS', 8)), float(os.getenv('ADMISSION_SUBMISSION_TIMEOUT', 30))),
+        'download': (int(os.getenv('ADMISSION_DOWNLOAD_SLOTS', 8)), float(os.getenv('ADMISSION_DOWNLOAD_TIMEOUT', 5))),
+        'auth': (int(os.getenv('ADMISSION_AUTH_SLOTS', 4)), float(os.getenv('ADMISSION_AUTH_TIMEOUT', 2))),
+        'admin': (int(os.getenv('ADMISSION_ADMIN_SLOTS', 2)), float(os.getenv('ADMISSION_ADMIN_TIMEOUT', 5))),
+        'page': (int(os.getenv('ADMISSION_PAGE_SLOTS', 16)), float(os.getenv('ADMISSION_PAGE_TIMEOUT', 2))),
+    }
+
+    # ASGI serving (see asgi.py)
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 32))  # threads running Flask behind the event loop
+    ASGI_SPOOL_MAX_BYTES = int(os.getenv('ASGI_SPOOL_MAX_BYTES', 256 * 1024 * 1024))  # request bodies read before the view runs
+    ASYNC_IO_THREADS = int(os.getenv('ASYNC_IO_THREADS', 16))  # storage reads issued by async views
+
+    # Cross-worker cache coherence (see sharedcache.py): 'sqlite' keeps the counters in a file for the workers
+    # of one host (SQLite WAL does not work over network filesystems); 'database' keeps them in the main
+    # database, so workers on several machines invalidate each other
+    CACHE_GENERATIONS_BACKEND = os.getenv('CACHE_GENERATIONS_BACKEND', 'sqlite')
+    CACHE_GENERATIONS_PATH = os.getenv('CACHE_GENERATIONS_PATH')  # defaults to instance/generations.db
+    SHARED_CACHE_SIZE = int(os.getenv('SHARED_CACHE_SIZE', 1024))  # entries per worker
+    SHARED_CACHE_TTL = int(os.getenv('SHARED_CACHE_TTL', 300))  # seconds; upper bound on staleness if a bump is lost
+
+    # Catalog JSON API (see catalog_api.py)
+    CATALOG_API_MAX_AGE = int(os.getenv('CATALOG_API_MAX_AGE', 300))  # seconds clients may reuse a response
+
+    # Server-side sessions (see server_sessions.py); the cookie only carries a session id
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'server')  # 'server' or 'cookie' (Flask's signed cookie)
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH')  # defaults to instance/sessions.db
+    SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', 10000))  # sessions kept in each worker's LRU
+    SESSION_IDLE_TIMEOUT = int(os.getenv('SESSION_IDLE_TIMEOUT', 24 * 3600))  # seconds, for non-permanent sessions
+    SESSION_PURGE_INTERVAL = int(os.getenv('SESSION_PURGE_INTERVAL', 600))
+
+    # Lecture notes history (see notes_history.py)
+    NOTES_SNAPSHOT_EVERY = int(os.getenv('NOTES_SNAPSHOT_EVERY', 10))  # full copy every N revisions, deltas between
+
+    # Storage accounting and quotas (see storage_usage.py); quotas are bytes, 0 means unlimited
+    STORAGE_USAGE_DB_PATH = os.getenv('STORAGE_USAGE_DB_PATH')  # defaults to instance/usage.db
+    STORAGE_COURSE_QUOTA = int(os.getenv('STORAGE_COURSE_QUOTA', 0))
+    STORAGE_COURSE_QUOTAS = os.getenv('STORAGE_COURSE_QUOTAS', '')  # per-course overrides, e.g. 'PROG1001=10737418240'
+    STORAGE_USER_QUOTA = int(os.getenv('STORAGE_USER_QUOTA', 0))
+    STORAGE_RECONCILE_INTERVAL = int(os.getenv('STORAGE_RECONCILE_INTERVAL', 6 * 3600))  # seconds between full rescans; 0 disables
+
+    # Activity log (see activity.py): events are buffered per worker and flushed in batches
+    ACTIVITY_DB_PATH = os.getenv('ACTIVITY_DB_PATH')  # defaults to instance/activity.db
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 5))  # seconds
+    ACTIVITY_MAX_BUFFER = int(os.getenv('ACTIVITY_MAX_BUFFER', 100000))  # events held between flushes before dropping
+    ACTIVITY_RETENTION_DAYS = int(os.getenv('ACTIVITY_RETENTION_DAYS', 90))  # raw events; rollups are kept
+
+    # SDN-WAN lab benchmarks (see sdn_bench.py)
+    SDN_BENCH_DB_PATH = os.getenv('SDN_BENCH_DB_PATH')  # defaults to instance/sdn_bench.db
+    SDN_BENCH_LAUNCHER = os.getenv('SDN_BENCH_LAUNCHER', 'mininet')  # 'mininet' (needs root) or 'synthetic'
+    SDN_BENCH_CONTROLLER = os.getenv('SDN_BENCH_CONTROLLER')  # remote controller 'ip[:port]'; Mininet's default if unset
+    SDN_BENCH_PARALLEL = int(os.getenv('SDN_BENCH_PARALLEL', 4))  # probes run at once within a run
+    SDN_BENCH_MAX_HOSTS = int(os.getenv('SDN_BENCH_MAX_HOSTS', 8))
+    SDN_BENCH_MAX_DURATION = int(os.getenv('SDN_BENCH_MAX_DURATION', 60))  # seconds per probe
+
+    # Template fragment cache (see fragment_cache.py); fragments are shared per role
+    FRAGMENT_CACHE_ENABLED = os.getenv('FRAGMENT_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 2048))  # rendered fragments kept per worker
+
+    # Backups (see backup.py); run 'python backup.py create' nightly from cron
+    BACKUP_DIR = os.getenv('BACKUP_DIR', 'backups')  # keep on a different disk from the data
+    BACKUP_UPLOAD_FOLDER = os.getenv('BACKUP_UPLOAD_FOLDER', 'uploads/lectures')  # used with STORAGE_BACKEND='local'; S3 is read from its bucket
+    BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', 14))  # snapshots kept by 'backup.py prune'
+
     # Security settings
     RESET_TOKEN_EXPIRATION = 3600  # 1 hour in seconds
@@ -0,0 +1,45 @@
+import logging
+import sqlite3
+
+from sqlalchemy import event
+
+
+def apply_sqlite_pragmas(dbapi_connection, config, read_only=False):
+    """Apply the SQLITE_* settings in ``config`` to a raw sqlite3 connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        # busy_timeout first so the journal_mode switch can wait out other writers
+        cursor.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT'])}")
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA cache_size = {int(config['SQLITE_CACHE_SIZE'])}")
+        cursor.execute(f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_SIZE'])}")
+        cursor.execute("PRAGMA foreign_keys = ON")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+    finally:
+        cursor.close()
+
+
+def init_db_tuning(app, db):
+    """Register the SQLite pragmas on every engine owned by ``db``."""
+    with app.app_context():
+        engines = dict(db.engines)
+
+    for bind_key, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        read_only = bind_key == 'replica'
+
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record, read_only=read_only):
+            if isinstance(dbapi_connection, sqlite3.Connection):
+                apply_sqlite_pragmas(dbapi_connection, app.config, read_only)
+
+        logging.debug(f"[init_db_tuning] SQLite pragmas registered for bind '{bind_key}'")
+
+
+def read_engine(db):
+    """Engine for list/report queries: the replica when configured, else the primary."""
+    return db.engines.get('replica', db.engine)
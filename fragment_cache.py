@@ -0,0 +1,52 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+# Bumped to drop every cached fragment at once, e.g. after editing templates in place
+FRAGMENT_GENERATION = 'fragments'
+
+
+def _hashable(key):
+    if isinstance(key, (list, tuple)):
+        return tuple(_hashable(part) for part in key)
+    return key
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key, ttl[, deps] %}...{% endcache %}`` renders the body once per role and key.
+
+    The rendered HTML is kept in the environment's ``fragment_cache`` (a
+    SharedCache) under the key plus the viewer's role, for ``ttl`` seconds or
+    until any generation in ``deps`` is bumped, e.g. a course's storage
+    generation. Anything that differs between users of the same role, such as
+    flashes or their own submissions, must stay outside the block.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_vary=lambda: None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        parser.stream.expect('comma')
+        args.append(parser.parse_expression())
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.List([]))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, deps, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.get_or_set(('fragment', self.environment.fragment_cache_vary(), _hashable(key)),
+                                [FRAGMENT_GENERATION, *deps], caller, ttl or None)
+
+
+def init_fragment_cache(app, cache, vary):
+    """Enable ``{% cache %}`` in templates; ``vary()`` names the viewer's role for the cache key."""
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache if app.config.get('FRAGMENT_CACHE_ENABLED', True) else None
+    app.jinja_env.fragment_cache_vary = vary
+    return cache
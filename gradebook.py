@@ -0,0 +1,261 @@
+import csv
+import io
+import json
+import logging
+import statistics
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ITEM_KINDS = ('assignment', 'test')
+# Older sheets label tests as exams; store them under the one name the views use
+KIND_ALIASES = {'exam': 'test'}
+HISTOGRAM_BINS = 10
+
+
+class GradebookError(Exception):
+    """Raised for invalid grade uploads; nothing from the upload is stored."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def _parse_score(value, where):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise GradebookError(f"{where}: '{value}' is not a number.")
+
+
+def parse_grades_csv(stream):
+    """Scores from a CSV with a 'student' column followed by one column per grade item.
+
+    Blank cells are skipped, so a sheet can carry only the marks that changed.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if not header or header[0].strip().lower() != 'student':
+        raise GradebookError("The first column of the CSV header must be 'student'.")
+    item_names = [name.strip() for name in header[1:]]
+    scores = []
+    for line_no, row in enumerate(reader, start=2):
+        if not row or not row[0].strip():
+            continue
+        student = row[0].strip()
+        for name, value in zip(item_names, row[1:]):
+            if value.strip():
+                scores.append((student, name, _parse_score(value, f"Line {line_no}")))
+    return [], scores
+
+
+def parse_grades_json(data):
+    """Items and scores from {"items": [{name, kind, max_score, weight}], "scores": [{student, item, score}]}."""
+    if not isinstance(data, dict):
+        raise GradebookError('Expected a JSON object with "items" and/or "scores".')
+    items = []
+    for entry in data.get('items') or []:
+        name = str(entry.get('name') or '').strip()
+        if not name:
+            raise GradebookError('Every grade item needs a name.')
+        kind = KIND_ALIASES.get(entry.get('kind'), entry.get('kind', 'assignment'))
+        if kind not in ITEM_KINDS:
+            raise GradebookError(f"Item '{name}': kind must be one of {', '.join(ITEM_KINDS)}.")
+        max_score = _parse_score(entry.get('max_score', 100), f"Item '{name}'")
+        weight = _parse_score(entry.get('weight', 0), f"Item '{name}'")
+        if max_score <= 0 or weight < 0:
+            raise GradebookError(f"Item '{name}': max_score must be positive and weight non-negative.")
+        items.append({'name': name, 'kind': kind, 'max_score': max_score, 'weight': weight})
+    scores = []
+    for i, entry in enumerate(data.get('scores') or []):
+        student = str(entry.get('student') or '').strip()
+        item = str(entry.get('item') or '').strip()
+        if not student or not item:
+            raise GradebookError(f"Score {i}: 'student' and 'item' are required.")
+        scores.append((student, item, _parse_score(entry.get('score'), f"Score {i}")))
+    return items, scores
+
+
+def parse_grades_file(stream, filename):
+    if filename.lower().endswith('.json'):
+        try:
+            return parse_grades_json(json.load(stream))
+        except ValueError:
+            raise GradebookError('The file is not valid JSON.')
+    if filename.lower().endswith('.csv'):
+        return parse_grades_csv(stream)
+    raise GradebookError('Upload a .csv or .json file.')
+
+
+def _median(values):
+    if not values:
+        return None
+    if numpy is not None:
+        return float(numpy.median(values))
+    return statistics.median(values)
+
+
+def _histogram(percentages):
+    """Counts of totals in HISTOGRAM_BINS equal bands from 0 to 100%."""
+    if numpy is not None:
+        counts, _ = numpy.histogram(numpy.clip(percentages, 0, 100), bins=HISTOGRAM_BINS, range=(0, 100))
+        return [int(c) for c in counts]
+    counts = [0] * HISTOGRAM_BINS
+    for p in percentages:
+        counts[min(max(int(p * HISTOGRAM_BINS // 100), 0), HISTOGRAM_BINS - 1)] += 1
+    return counts
+
+
+class Gradebook:
+    """Grade items and scores per course, with cached class statistics.
+
+    Statistics are computed with a few aggregate queries per course and kept
+    in memory together with the course's revision number. Every ingest bumps
+    the revision in the same transaction, so a cached entry is reused until
+    any worker writes new marks, and checking it costs one primary-key lookup.
+    """
+
+    def __init__(self, db, item_model, score_model, revision_model, cache_size=256):
+        self.db = db
+        self.Item = item_model
+        self.Score = score_model
+        self.Revision = revision_model
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def items(self, course_id, kind=None):
+        query = self.Item.query.filter_by(course_id=course_id)
+        if kind:
+            query = query.filter_by(kind=kind)
+        return query.order_by(self.Item.id).all()
+
+    def ingest(self, course_id, items=(), scores=()):
+        """Upsert grade items and scores for a course in one transaction."""
+        session = self.db.session
+        try:
+            now = datetime.now()
+            if items:
+                self._upsert(self.Item.__table__, ['course_id', 'name'], ['kind', 'max_score', 'weight'],
+                             [dict(item, course_id=course_id) for item in items])
+            known = {item.name: item for item in self.items(course_id)}
+            unknown = sorted({name for _, name, _ in scores if name not in known})
+            if unknown:
+                raise GradebookError(f"Unknown grade items: {', '.join(unknown)}. Create them first.")
+            rows = []
+            for student, name, score in scores:
+                if not 0 <= score <= known[name].max_score:
+                    raise GradebookError(f"{student}: score {score:g} for '{name}' is outside 0-{known[name].max_score:g}.")
+                rows.append({'item_id': known[name].id, 'student': student, 'score': score, 'updated_at': now})
+            if rows:
+                self._upsert(self.Score.__table__, ['item_id', 'student'], ['score', 'updated_at'], rows)
+            self._bump_revision(course_id)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        logging.debug(f"[Gradebook.ingest] {course_id}: {len(items)} item(s), {len(scores)} score(s)")
+        return {'items': len(items), 'scores': len(scores)}
+
+    def _upsert(self, table, keys, columns, rows):
+        session = self.db.session
+        dialect = session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(index_elements=keys,
+                                              set_={c: stmt.excluded[c] for c in columns})
+            # One executemany for the whole batch
+            session.execute(stmt, rows)
+            return
+        for row in rows:
+            match = [table.c[k] == row[k] for k in keys]
+            result = session.execute(update(table).where(*match).values({c: row[c] for c in columns}))
+            if result.rowcount == 0:
+                session.execute(table.insert().values(row))
+
+    def _bump_revision(self, course_id):
+        table = self.Revision.__table__
+        result = self.db.session.execute(update(table).where(table.c.course_id == course_id)
+                                         .values(revision=table.c.revision + 1))
+        if result.rowcount == 0:
+            self.db.session.execute(table.insert().values(course_id=course_id, revision=1))
+
+    def _revision(self, course_id):
+        row = self.db.session.get(self.Revision, course_id)
+        return row.revision if row else 0
+
+    def statistics(self, course_id):
+        """Per-item and weighted-total statistics for a course (cached until the next write)."""
+        revision = self._revision(course_id)
+        with self._lock:
+            cached = self._cache.get(course_id)
+            if cached and cached[0] == revision:
+                self._cache.move_to_end(course_id)
+                return cached[1]
+        stats = self._compute_statistics(course_id)
+        with self._lock:
+            self._cache[course_id] = (revision, stats)
+            self._cache.move_to_end(course_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return stats
+
+    def _compute_statistics(self, course_id):
+        Item, Score = self.Item, self.Score
+        session = self.db.session
+        joined = select().select_from(Score).join(Item, Item.id == Score.item_id).where(Item.course_id == course_id)
+
+        items = {item.id: {'id': item.id, 'name': item.name, 'kind': item.kind, 'max_score': item.max_score,
+                           'weight': item.weight, 'count': 0, 'mean': None, 'median': None,
+                           'min': None, 'max': None}
+                 for item in self.items(course_id)}
+        for item_id, count, mean, low, high in session.execute(
+                joined.add_columns(Score.item_id, func.count(Score.score), func.avg(Score.score),
+                                   func.min(Score.score), func.max(Score.score)).group_by(Score.item_id)):
+            items[item_id].update(count=count, mean=mean, min=low, max=high)
+
+        # Medians need the values themselves: one scan sorted by item then score,
+        # sliced per item using the counts above
+        scores = session.execute(joined.add_columns(Score.score).order_by(Score.item_id, Score.score)).scalars().all()
+        start = 0
+        for item in items.values():
+            count = item['count']
+            if count:
+                middle = start + count // 2
+                item['median'] = scores[middle] if count % 2 else (scores[middle - 1] + scores[middle]) / 2
+            start += count
+
+        # Weighted total per student, as a percentage of the weight they have been graded on
+        percentages = [100.0 * earned / weight for earned, weight in session.execute(
+            joined.add_columns(func.sum(Score.score / Item.max_score * Item.weight), func.sum(Item.weight))
+            .group_by(Score.student)) if weight]
+        return {
+            'items': list(items.values()),
+            'students': len(percentages),
+            'total_mean': sum(percentages) / len(percentages) if percentages else None,
+            'total_median': _median(percentages),
+            'histogram': _histogram(percentages),
+        }
+
+    def student_grades(self, course_id, student):
+        """The student's scores per item and their weighted total percentage (None if ungraded)."""
+        Item, Score = self.Item, self.Score
+        rows = self.db.session.execute(
+            select(Item, Score.score)
+            .outerjoin(Score, (Score.item_id == Item.id) & (Score.student == student))
+            .where(Item.course_id == course_id).order_by(Item.id)).all()
+        grades = [{'name': item.name, 'kind': item.kind, 'max_score': item.max_score,
+                   'weight': item.weight, 'score': score} for item, score in rows]
+        graded = [g for g in grades if g['score'] is not None and g['weight']]
+        weight = sum(g['weight'] for g in graded)
+        total = 100.0 * sum(g['score'] / g['max_score'] * g['weight'] for g in graded) / weight if weight else None
+        return grades, total
@@ -0,0 +1,121 @@
+import difflib
+import json
+import logging
+import zlib
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+
+def make_delta(old_lines, new_lines):
+    """Line delta turning ``old_lines`` into ``new_lines``: copy ranges plus inserted lines."""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif tag in ('replace', 'insert'):
+            ops.append(new_lines[j1:j2])
+    return ops
+
+
+def apply_delta(old_lines, ops):
+    lines = []
+    for op in ops:
+        if len(op) == 2 and all(isinstance(i, int) for i in op):
+            lines.extend(old_lines[op[0]:op[1]])
+        else:
+            lines.extend(op)
+    return lines
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class NotesHistory:
+    """Revision history of each course's lecture notes.
+
+    Revision 1, and every revision ``snapshot_every`` after the previous
+    snapshot, is stored whole; the ones between are compressed line deltas
+    against their predecessor. Rebuilding any revision therefore reads one
+    snapshot and fewer than ``snapshot_every`` deltas, even if the setting
+    changed while the history was being written.
+    The current text itself stays in storage as lecture_notes.txt.
+    """
+
+    def __init__(self, db, model, snapshot_every=10):
+        if snapshot_every < 1:
+            raise ValueError('snapshot_every must be at least 1')
+        self.db = db
+        self.Revision = model
+        self.snapshot_every = snapshot_every
+
+    def head(self, course_id):
+        return self.db.session.execute(
+            select(func.coalesce(func.max(self.Revision.revision), 0))
+            .where(self.Revision.course_id == course_id)).scalar()
+
+    def revisions(self, course_id):
+        R = self.Revision
+        return R.query.with_entities(R.revision, R.is_snapshot, R.size, R.author, R.created_at) \
+            .filter_by(course_id=course_id).order_by(R.revision.desc()).all()
+
+    def _snapshot_base(self, course_id, revision):
+        # Nearest snapshot at or before ``revision``; revision 1 always is one
+        R = self.Revision
+        return self.db.session.execute(
+            select(func.max(R.revision))
+            .where(R.course_id == course_id, R.is_snapshot, R.revision <= revision)).scalar() or 1
+
+    def get(self, course_id, revision):
+        """Text of ``revision``, or None if the course has no such revision."""
+        R = self.Revision
+        rows = R.query.filter(R.course_id == course_id, R.revision <= revision,
+                              R.revision >= self._snapshot_base(course_id, revision)) \
+            .order_by(R.revision).all()
+        if not rows or rows[-1].revision != revision:
+            return None
+        lines = _unpack(rows[0].data)
+        for row in rows[1:]:
+            lines = apply_delta(lines, _unpack(row.data))
+        return ''.join(lines)
+
+    def save(self, course_id, text, author):
+        """Record ``text`` as the next revision; returns its number (unchanged text is not recorded)."""
+        session = self.db.session
+        for _ in range(3):
+            head = self.head(course_id)
+            previous = self.get(course_id, head) if head else None
+            if previous == text:
+                return head
+            revision = head + 1
+            lines = text.splitlines(keepends=True)
+            # Counted from the last snapshot, so a changed snapshot_every still bounds the delta chain
+            is_snapshot = previous is None or revision - self._snapshot_base(course_id, head) >= self.snapshot_every
+            data = lines if is_snapshot else make_delta(previous.splitlines(keepends=True), lines)
+            session.add(self.Revision(course_id=course_id, revision=revision, is_snapshot=is_snapshot,
+                                      data=_pack(data), size=len(text.encode('utf-8')), author=author,
+                                      created_at=datetime.now()))
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another save took this revision number; rebase on it
+                session.rollback()
+                continue
+            logging.debug(f"[NotesHistory.save] {course_id} revision {revision} ({'snapshot' if is_snapshot else 'delta'})")
+            return revision
+        raise RuntimeError(f"Could not save lecture notes for {course_id}")
+
+    def diff(self, course_id, old, new):
+        """Unified diff between two revisions, as a list of lines."""
+        old_text, new_text = self.get(course_id, old), self.get(course_id, new)
+        if old_text is None or new_text is None:
+            return None
+        return list(difflib.unified_diff(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                                         fromfile=f"revision {old}", tofile=f"revision {new}"))
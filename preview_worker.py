@@ -0,0 +1,28 @@
+"""Preview worker process, started by PreviewStore as ``python preview_worker.py``.
+
+Reads one JSON job per line on stdin and answers each with one JSON line on
+stdout. Being its own entry script, it imports only what preview generation
+needs, never the web app.
+"""
+import json
+import sys
+
+from previews import generate_preview
+
+
+def main():
+    out = sys.stdout
+    # Anything a library prints must not corrupt the result stream
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        job = json.loads(line)
+        try:
+            result = {'meta': generate_preview(job['path'], job['cache_dir'])}
+        except Exception as e:
+            result = {'error': f"{type(e).__name__}: {e}"}
+        out.write(json.dumps(result) + '\n')
+        out.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from search_index import extract_text
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+EXCERPT_LENGTH = 300
+THUMBNAIL_WIDTH = 240
+# What the thumbnail route may serve: a content hash plus an image type browsers render
+THUMBNAIL_NAME = re.compile(r'[0-9a-f]{64}\.(png|jpe?g)')
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preview_worker.py')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _page_count(path, extension):
+    if extension == 'pptx':
+        with zipfile.ZipFile(path) as z:
+            return sum(1 for n in z.namelist() if re.match(r'ppt/slides/slide\d+\.xml$', n))
+    if extension == 'docx':
+        with zipfile.ZipFile(path) as z:
+            try:
+                match = re.search(r'<Pages>(\d+)</Pages>', z.read('docProps/app.xml').decode('utf-8', 'replace'))
+            except KeyError:
+                return None
+            return int(match.group(1)) if match else None
+    if extension == 'pdf' and PdfReader is not None:
+        return len(PdfReader(path).pages)
+    return None
+
+
+def _write_thumbnail(path, extension, dest_base):
+    """Write a small thumbnail next to ``dest_base`` and return its filename, or None."""
+    if extension in ('docx', 'pptx'):
+        # Office files usually carry a rendered first-page thumbnail
+        with zipfile.ZipFile(path) as z:
+            for name in z.namelist():
+                # WMF/EMF thumbnails are skipped; browsers cannot show them
+                if name.lower() in ('docprops/thumbnail.png', 'docprops/thumbnail.jpeg', 'docprops/thumbnail.jpg'):
+                    thumb = dest_base + os.path.splitext(name)[1].lower()
+                    with z.open(name) as src, open(thumb, 'wb') as dst:
+                        shutil.copyfileobj(src, dst)
+                    return os.path.basename(thumb)
+    if extension == 'pdf' and shutil.which('pdftoppm'):
+        subprocess.run(['pdftoppm', '-png', '-singlefile', '-f', '1', '-l', '1',
+                        '-scale-to-x', str(THUMBNAIL_WIDTH), '-scale-to-y', '-1', path, dest_base],
+                       check=True, timeout=60, capture_output=True)
+        return os.path.basename(dest_base + '.png')
+    return None
+
+
+def generate_preview(path, cache_dir):
+    """Build (or reuse) the preview for ``path``; runs in a worker process.
+
+    Previews are keyed by content hash, so re-uploading an unchanged file
+    costs one hash pass and nothing else.
+    """
+    sha256 = file_sha256(path)
+    meta_path = os.path.join(cache_dir, f"{sha256}.json")
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    meta = {'sha256': sha256, 'size': os.path.getsize(path), 'extension': extension,
+            'pages': None, 'excerpt': None, 'thumbnail': None}
+    try:
+        meta['pages'] = _page_count(path, extension)
+        text = extract_text(path)
+        if text:
+            meta['excerpt'] = ' '.join(text.split())[:EXCERPT_LENGTH]
+        meta['thumbnail'] = _write_thumbnail(path, extension, os.path.join(cache_dir, sha256))
+    except Exception as e:
+        # Keep whatever we have; a corrupt upload should still list normally
+        meta['error'] = str(e)
+
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+    return meta
+
+
+class PreviewStore:
+    """Preview metadata for uploaded lecture files, generated in worker processes.
+
+    ``cache_dir`` holds one JSON document (and optional thumbnail) per content
+    hash; the database at ``db_path`` maps each course file to its current
+    hash so listings never open the originals. It lives outside ``cache_dir``,
+    which is served to browsers. Files are read through ``storage``; remote
+    objects are staged to a temp file for the worker and removed afterwards.
+    """
+
+    def __init__(self, cache_dir, db_path, storage, workers=2):
+        self.cache_dir = cache_dir
+        self.storage = storage
+        os.makedirs(cache_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.workers = workers
+        # One worker process per staging thread, started from preview_worker.py on first use
+        self._local = threading.local()
+        # Stage each file out of storage and wait on its worker process, off the request thread
+        self._stager = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='preview-stage')
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_previews (
+                    course_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    meta TEXT NOT NULL,
+                    PRIMARY KEY (course_id, filename)
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _worker(self):
+        proc = getattr(self._local, 'proc', None)
+        if proc is None or proc.poll() is not None:
+            # A separate interpreter: workers inherit none of the web process's threads, sockets or setup
+            proc = subprocess.Popen([sys.executable, WORKER_SCRIPT], stdin=subprocess.PIPE,
+                                    stdout=subprocess.PIPE, text=True)
+            self._local.proc = proc
+        return proc
+
+    def _run(self, path):
+        """generate_preview(path) in this thread's worker process."""
+        proc = self._worker()
+        job = {'path': os.path.abspath(path), 'cache_dir': os.path.abspath(self.cache_dir)}
+        try:
+            proc.stdin.write(json.dumps(job) + '\n')
+            proc.stdin.flush()
+            line = proc.stdout.readline()
+        except BrokenPipeError:
+            line = ''
+        if not line:
+            # The worker died (e.g. OOM on a huge file); the next job starts a fresh one
+            proc.kill()
+            raise RuntimeError(f"Preview worker exited with status {proc.wait()}")
+        result = json.loads(line)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return result['meta']
+
+    def enqueue(self, course_id, key):
+        """Generate the preview of the storage ``key`` in the background."""
+        return self._stager.submit(self._generate, course_id, key)
+
+    def _generate(self, course_id, key):
+        try:
+            with self.storage.local_copy(key) as path:
+                meta = self._run(path)
+        except Exception:
+            logging.exception(f"[PreviewStore] Preview generation failed for {key}")
+            return None
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO file_previews (course_id, filename, meta) VALUES (?, ?, ?)",
+                         (course_id, posixpath.basename(key), json.dumps(meta)))
+        return meta
+
+    def for_course(self, course_id):
+        """Map filename -> preview metadata for every previewed file of a course."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT filename, meta FROM file_previews WHERE course_id = ?",
+                                (course_id,)).fetchall()
+        return {filename: json.loads(meta) for filename, meta in rows}
+
+    def thumbnail_path(self, course_id, filename):
+        """Path of ``filename`` if it is a thumbnail of one of the course's files, else None."""
+        if not THUMBNAIL_NAME.fullmatch(filename):
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM file_previews WHERE course_id = ? AND json_extract(meta, '$.thumbnail') = ?",
+                               (course_id, filename)).fetchone()
+        return os.path.join(self.cache_dir, filename) if row else None
@@ -0,0 +1,150 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from flask import jsonify, request
+
+
+class RateLimited(Exception):
+    def __init__(self, rule, retry_after):
+        super().__init__(f"Rate limit '{rule}' exceeded")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+def parse_rate(value):
+    """'10/60' -> (capacity 10, refill rate 10/60 tokens per second)."""
+    capacity, seconds = (float(part) for part in str(value).split('/'))
+    return capacity, capacity / seconds
+
+
+class MemoryBucketStore:
+    """Token buckets in this process only; fine for a single worker."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                # A flood of distinct keys; buckets idle for an hour have long refilled
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+            self._buckets[key] = (tokens, now)
+        return allowed, tokens
+
+
+class SQLiteBucketStore:
+    """Token buckets in an SQLite file shared by every worker process on the host."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._takes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front, so read-modify-write is atomic across workers
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            self._takes += 1
+            if self._takes % self.PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 86400,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+
+class RateLimiter:
+    """Named token-bucket rules applied to arbitrary keys (client IP, username, email).
+
+    ``hit`` is meant to run before any password hashing, database query or
+    mail send, so a flood costs one bucket update per request. Counters are
+    per worker process.
+    """
+
+    def __init__(self, store, rules, enabled=True):
+        self.store = store
+        self.rules = {name: parse_rate(rate) for name, rate in rules.items()}
+        self.enabled = enabled
+        self.counters = Counter()
+
+    def hit(self, rule, key):
+        if not self.enabled or not key:
+            return
+        capacity, rate = self.rules[rule]
+        try:
+            allowed, tokens = self.store.take(f"{rule}:{key.lower()}", capacity, rate, time.time())
+        except sqlite3.Error:
+            # Fail open: a locked or broken limiter store must not lock everyone out
+            logging.exception(f"[RateLimiter.hit] Bucket store failed for rule '{rule}'")
+            self.counters[f"{rule}.errors"] += 1
+            return
+        if not allowed:
+            self.counters[f"{rule}.rejected"] += 1
+            raise RateLimited(rule, max(int((1 - tokens) / rate) + 1, 1))
+        self.counters[f"{rule}.allowed"] += 1
+
+
+def client_ip():
+    # The real client behind PROXY_FIX_HOPS trusted proxies; without them every user shares the proxy's bucket
+    return request.remote_addr or 'unknown'
+
+
+def init_rate_limits(app):
+    """Create the app's RateLimiter, its 429 handler and the /metrics/rate_limits endpoint."""
+    if app.config.get('RATELIMIT_STORAGE', 'sqlite') == 'memory':
+        store = MemoryBucketStore()
+    else:
+        store = SQLiteBucketStore(app.config.get('RATELIMIT_DB_PATH') or os.path.join(app.instance_path, 'ratelimit.db'))
+    limiter = RateLimiter(store, {
+        'login_ip': app.config['RATELIMIT_LOGIN_IP'],
+        'login_user': app.config['RATELIMIT_LOGIN_USER'],
+        'reset_ip': app.config['RATELIMIT_RESET_IP'],
+        'reset_email': app.config['RATELIMIT_RESET_EMAIL'],
+    }, enabled=app.config.get('RATELIMIT_ENABLED', True))
+
+    @app.errorhandler(RateLimited)
+    def handle_rate_limited(e):
+        logging.warning(f"[handle_rate_limited] {e} by {client_ip()}")
+        return (f"Too many attempts. Please try again in {e.retry_after} seconds.", 429,
+                {'Retry-After': str(e.retry_after)})
+
+    @app.route('/metrics/rate_limits')
+    def rate_limit_metrics():
+        """Allowed/rejected counts per rule for this worker."""
+        return jsonify({'store': type(store).__name__, 'counters': dict(limiter.counters)})
+
+    return limiter
@@ -0,0 +1,7 @@
+from app import app, search_index
+
+# Backfills the search index from the storage backend, e.g. after restoring uploads.
+# Upload routes keep the index current on their own; unchanged files are skipped.
+with app.app_context():
+    indexed = search_index.reindex_all()
+    print(f"Indexed {indexed} new or changed file(s)")
@@ -0,0 +1,493 @@
+"""Throughput and latency benchmarks of SDN-WAN lab topologies, with results kept per run.
+
+A launcher brings a topology up and hands back a network that can probe
+between its hosts; MininetLauncher builds it in Mininet with shaped WAN
+links, SyntheticLauncher models the same links without any emulation so
+the whole pipeline runs anywhere. Results are stored column by column
+(see ResultStore) and summarised per run for comparisons.
+
+Usage (Mininet needs root): sudo python sdn_bench.py --kind dumbbell --hosts 2 --delay 20 --loss 0.5 --bw 10
+"""
+import argparse
+import fcntl
+import json
+import logging
+import math
+import os
+import random
+import re
+import sqlite3
+import statistics
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    from mininet.link import TCLink
+    from mininet.net import Mininet
+    from mininet.node import RemoteController
+    from mininet.topo import Topo
+except ImportError:
+    Mininet = None
+
+TOPOLOGY_KINDS = ('dumbbell', 'linear')
+PROBE_KINDS = ('latency', 'throughput')
+MAX_HOSTS = 8
+MAX_DURATION = 60
+
+
+class BenchmarkError(ValueError):
+    pass
+
+
+def _number(data, name, default, low, high):
+    try:
+        value = float(data.get(name, default))
+    except (TypeError, ValueError):
+        raise BenchmarkError(f"{name} must be a number")
+    if not low <= value <= high:
+        raise BenchmarkError(f"{name} must be between {low} and {high}")
+    return value
+
+
+def parse_topology(data, max_hosts=MAX_HOSTS):
+    """Validated topology from form or JSON fields.
+
+    'dumbbell': two sites of ``hosts`` hosts each, joined by one WAN link.
+    'linear': ``hosts`` sites in a chain, one host each, joined by WAN links.
+    Every WAN link gets the given one-way delay (ms), loss (%) and bandwidth (Mbit/s).
+    """
+    kind = data.get('kind') or 'dumbbell'
+    if kind not in TOPOLOGY_KINDS:
+        raise BenchmarkError(f"Unknown topology kind '{kind}'")
+    topology = {
+        'kind': kind,
+        'hosts': int(_number(data, 'hosts', 2, 2 if kind == 'linear' else 1, max_hosts)),
+        'delay_ms': _number(data, 'delay_ms', 20, 0, 1000),
+        'loss_pct': _number(data, 'loss_pct', 0, 0, 50),
+        'bandwidth_mbps': _number(data, 'bandwidth_mbps', 10, 0.1, 1000),
+    }
+    topology['name'] = (f"{kind}-{topology['hosts']}h-{topology['delay_ms']:g}ms-"
+                        f"{topology['loss_pct']:g}pct-{topology['bandwidth_mbps']:g}mbps")
+    return topology
+
+
+def host_pairs(topology):
+    """(src, dst, wan_hops) for every probed pair; all probes cross at least one WAN link."""
+    n = topology['hosts']
+    if topology['kind'] == 'dumbbell':
+        return [(f"a{i}", f"b{i}", 1) for i in range(1, n + 1)]
+    return [('h1', f"h{i}", i - 1) for i in range(2, n + 1)]
+
+
+# --- Launchers ---
+
+class SyntheticNetwork:
+    """Stand-in for an emulated network: measurements follow simple link models plus noise.
+
+    Latency is the round trip over the WAN hops with jitter, and pings are lost
+    at the link loss rate. Throughput is the fair share of the bottleneck link
+    capped by the Mathis et al. TCP bound for the path's RTT and loss.
+    """
+
+    def __init__(self, topology, rng):
+        self.topology = topology
+        self.rng = rng
+        self._lock = threading.Lock()
+
+    def pairs(self):
+        return host_pairs(self.topology)
+
+    def _rtt_ms(self, hops):
+        return 2 * self.topology['delay_ms'] * hops + 0.1
+
+    def _noise(self, sigma):
+        with self._lock:
+            return self.rng.gauss(0, sigma)
+
+    def _lost(self, probability):
+        with self._lock:
+            return self.rng.random() < probability
+
+    def probe(self, kind, src, dst, hops, duration):
+        t = self.topology
+        path_loss = 1 - (1 - t['loss_pct'] / 100) ** hops
+        rtt = self._rtt_ms(hops)
+        samples = []
+        if kind == 'latency':
+            for seq in range(int(duration / 0.2)):
+                if not self._lost(1 - (1 - path_loss) ** 2):
+                    samples.append((seq * 0.2, max(rtt + self._noise(rtt * 0.05 + 0.02), 0.01)))
+            return samples
+        # Dumbbell pairs share the single WAN link; linear paths from h1 share its first hop
+        share = t['bandwidth_mbps'] / len(self.pairs())
+        if path_loss:
+            share = min(share, 1460 * 8 / 1e6 / (rtt / 1000) * 1.22 / math.sqrt(path_loss))
+        for second in range(int(duration)):
+            samples.append((second + 1.0, max(share * (0.95 + self._noise(0.03)), 0.0)))
+        return samples
+
+
+class SyntheticLauncher:
+    name = 'synthetic'
+
+    def __init__(self, seed=None):
+        self.seed = seed
+
+    @contextmanager
+    def launch(self, topology):
+        yield SyntheticNetwork(topology, random.Random(self.seed))
+
+
+class MininetNetwork:
+    def __init__(self, net, topology):
+        self.net = net
+        self.topology = topology
+        self._ports = iter(range(5001, 6000))
+        self._lock = threading.Lock()
+
+    def pairs(self):
+        return host_pairs(self.topology)
+
+    def _run(self, host, args):
+        # popen gives each probe its own process, so probes sharing a host can run at once
+        proc = host.popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        return proc.communicate()[0].decode('utf-8', 'replace')
+
+    def probe(self, kind, src, dst, hops, duration):
+        src_host, dst_host = self.net.get(src), self.net.get(dst)
+        if kind == 'latency':
+            output = self._run(src_host, ['ping', '-n', '-i', '0.2', '-c', str(int(duration / 0.2)), dst_host.IP()])
+            return [(int(seq) * 0.2, float(rtt)) for seq, rtt in
+                    re.findall(r'icmp_seq=(\d+) .*time=([\d.]+) ms', output)]
+        with self._lock:
+            port = str(next(self._ports))
+        server = dst_host.popen(['iperf', '-s', '-p', port], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            time.sleep(0.5)
+            output = self._run(src_host, ['iperf', '-c', dst_host.IP(), '-p', port, '-t', str(int(duration)),
+                                          '-i', '1', '-f', 'm'])
+        finally:
+            server.terminate()
+        # Per-second intervals only; the final line covers the whole run
+        return [(float(end), float(rate)) for start, end, rate in
+                re.findall(r'([\d.]+)-\s*([\d.]+) sec\s+[\d.]+ \w?Bytes\s+([\d.]+) Mbits/sec', output)
+                if float(end) - float(start) <= 1.5]
+
+
+class MininetLauncher:
+    """Builds topologies in Mininet with TCLink-shaped WAN links (requires the mininet package and root)."""
+
+    name = 'mininet'
+
+    def __init__(self, controller=None):
+        if Mininet is None:
+            raise RuntimeError("The mininet launcher requires the mininet package")
+        self.controller = controller
+
+    def _build(self, topology):
+        t = topology
+        wan = {'bw': t['bandwidth_mbps'], 'delay': f"{t['delay_ms']:g}ms", 'loss': t['loss_pct']}
+        topo = Topo()
+        if t['kind'] == 'dumbbell':
+            left, right = topo.addSwitch('s1'), topo.addSwitch('s2')
+            topo.addLink(left, right, **wan)
+            for i in range(1, t['hosts'] + 1):
+                topo.addLink(topo.addHost(f"a{i}"), left)
+                topo.addLink(topo.addHost(f"b{i}"), right)
+        else:
+            previous = None
+            for i in range(1, t['hosts'] + 1):
+                switch = topo.addSwitch(f"s{i}")
+                topo.addLink(topo.addHost(f"h{i}"), switch)
+                if previous:
+                    topo.addLink(previous, switch, **wan)
+                previous = switch
+        return topo
+
+    @contextmanager
+    def launch(self, topology):
+        kwargs = {}
+        if self.controller:
+            ip, _, port = self.controller.partition(':')
+            kwargs['controller'] = lambda name: RemoteController(name, ip=ip, port=int(port or 6653))
+        net = Mininet(topo=self._build(topology), link=TCLink, autoSetMacs=True, **kwargs)
+        net.start()
+        try:
+            yield MininetNetwork(net, topology)
+        finally:
+            net.stop()
+
+
+def available_launchers(controller=None):
+    launchers = {'synthetic': SyntheticLauncher()}
+    if Mininet is not None:
+        launchers['mininet'] = MininetLauncher(controller)
+    return launchers
+
+
+# --- Columnar result store ---
+
+def encode_column(values, dtype):
+    """Pack one column: 'f' float32 and 'i' int32 as raw arrays, 's' dictionary-encoded."""
+    if dtype == 's':
+        dictionary = sorted(set(values))
+        index = {value: i for i, value in enumerate(dictionary)}
+        header = json.dumps(dictionary).encode('utf-8')
+        body = struct.pack('>I', len(header)) + header + array('H', [index[v] for v in values]).tobytes()
+    else:
+        body = array(dtype, values).tobytes()
+    return zlib.compress(body)
+
+
+def decode_column(blob, dtype):
+    body = zlib.decompress(blob)
+    if dtype == 's':
+        size = struct.unpack('>I', body[:4])[0]
+        dictionary = json.loads(body[4:4 + size].decode('utf-8'))
+        codes = array('H')
+        codes.frombytes(body[4 + size:])
+        return [dictionary[code] for code in codes]
+    values = array(dtype)
+    values.frombytes(body)
+    return values.tolist()
+
+
+SAMPLE_COLUMNS = (('probe', 's'), ('src', 's'), ('dst', 's'), ('hops', 'i'), ('t', 'f'), ('value', 'f'))
+
+
+def _percentile(ordered, q):
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(values):
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    return {'count': len(ordered), 'mean': round(statistics.fmean(ordered), 3),
+            'p50': round(_percentile(ordered, 0.5), 3), 'p95': round(_percentile(ordered, 0.95), 3),
+            'min': round(ordered[0], 3), 'max': round(ordered[-1], 3)}
+
+
+class ResultStore:
+    """Benchmark runs in SQLite, one compressed blob per sample column.
+
+    Samples are written once per run as whole columns (probe, src, dst, hops,
+    t, value), so a report reads and decodes only the columns it needs. A
+    per-probe summary is stored with each run, and comparisons across runs
+    and topologies read just those.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, created REAL NOT NULL, label TEXT, launcher TEXT NOT NULL,
+                topology TEXT NOT NULL, topology_name TEXT NOT NULL, probes TEXT NOT NULL,
+                duration REAL NOT NULL, status TEXT NOT NULL, error TEXT, samples INTEGER, summary TEXT,
+                pid INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS ix_runs_topology ON runs (topology_name, status);
+            CREATE TABLE IF NOT EXISTS columns (
+                run_id INTEGER NOT NULL, name TEXT NOT NULL, dtype TEXT NOT NULL, data BLOB NOT NULL,
+                PRIMARY KEY (run_id, name)
+            );
+        """)
+        if 'pid' not in {row['name'] for row in conn.execute("PRAGMA table_info(runs)")}:
+            conn.execute("ALTER TABLE runs ADD COLUMN pid INTEGER")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create_run(self, topology, launcher, probes, duration, label=None):
+        return self._connection().execute(
+            "INSERT INTO runs (created, label, launcher, topology, topology_name, probes, duration, status, pid) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 'running', ?)",
+            (time.time(), label, launcher, json.dumps(topology), topology['name'], ','.join(probes),
+             duration, os.getpid())).lastrowid
+
+    def finish(self, run_id, columns):
+        summary = {}
+        for probe in sorted(set(columns['probe'])):
+            summary[probe] = summarize([v for p, v in zip(columns['probe'], columns['value']) if p == probe])
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO columns (run_id, name, dtype, data) VALUES (?, ?, ?, ?)",
+                             [(run_id, name, dtype, encode_column(columns[name], dtype))
+                              for name, dtype in SAMPLE_COLUMNS])
+            conn.execute("UPDATE runs SET status = 'done', samples = ?, summary = ? WHERE id = ?",
+                         (len(columns['value']), json.dumps(summary), run_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def fail(self, run_id, error):
+        self._connection().execute("UPDATE runs SET status = 'failed', error = ? WHERE id = ?", (error, run_id))
+
+    def fail_orphaned(self):
+        """Mark runs whose process has exited (e.g. a killed worker) as failed; returns how many."""
+        orphaned = []
+        for row in self._connection().execute("SELECT id, pid FROM runs WHERE status = 'running'"):
+            try:
+                os.kill(row['pid'], 0)
+            except (TypeError, ProcessLookupError):
+                orphaned.append(row['id'])
+            except PermissionError:
+                # Alive, but owned by another user
+                pass
+        for run_id in orphaned:
+            self.fail(run_id, 'Interrupted: the process running it exited')
+        return len(orphaned)
+
+    def _run_dict(self, row):
+        run = dict(row)
+        run['topology'] = json.loads(run['topology'])
+        run['summary'] = json.loads(run['summary']) if run['summary'] else {}
+        return run
+
+    def runs(self, limit=50):
+        return [self._run_dict(row) for row in self._connection().execute(
+            "SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,))]
+
+    def run(self, run_id):
+        row = self._connection().execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return self._run_dict(row) if row else None
+
+    def load(self, run_id, names=None):
+        """{column: values} for a run, decoding only ``names`` when given."""
+        wanted = list(names or [name for name, _ in SAMPLE_COLUMNS])
+        rows = self._connection().execute(
+            f"SELECT name, dtype, data FROM columns WHERE run_id = ? AND name IN ({','.join('?' * len(wanted))})",
+            [run_id] + wanted).fetchall()
+        return {row['name']: decode_column(row['data'], row['dtype']) for row in rows}
+
+    def pair_summary(self, run_id):
+        """Per (probe, src, dst) statistics of one run."""
+        columns = self.load(run_id, ('probe', 'src', 'dst', 'hops', 'value'))
+        groups = {}
+        for probe, src, dst, hops, value in zip(columns.get('probe', ()), columns.get('src', ()),
+                                                 columns.get('dst', ()), columns.get('hops', ()),
+                                                 columns.get('value', ())):
+            groups.setdefault((probe, src, dst, hops), []).append(value)
+        return [dict(probe=probe, src=src, dst=dst, hops=hops, **summarize(values))
+                for (probe, src, dst, hops), values in sorted(groups.items())]
+
+    def compare(self, run_ids):
+        """Finished runs side by side, from their stored summaries."""
+        return [run for run in (self.run(run_id) for run_id in run_ids) if run and run['status'] == 'done']
+
+    def by_topology(self):
+        """Median of each probe's per-run median, per topology, across all finished runs."""
+        groups = {}
+        for row in self._connection().execute(
+                "SELECT topology_name, summary FROM runs WHERE status = 'done' ORDER BY topology_name"):
+            entry = groups.setdefault(row['topology_name'], {'runs': 0, 'probes': {}})
+            entry['runs'] += 1
+            for probe, stats in json.loads(row['summary']).items():
+                if stats.get('count'):
+                    entry['probes'].setdefault(probe, []).append(stats['p50'])
+        return [{'topology': name, 'runs': entry['runs'],
+                 'probes': {probe: round(statistics.median(values), 3) for probe, values in entry['probes'].items()}}
+                for name, entry in groups.items()]
+
+
+# --- Runner ---
+
+class BenchmarkRunner:
+    """Runs benchmarks one at a time in a background thread, probing each run's pairs in parallel.
+
+    Mininet cannot host two topologies side by side (switch and interface
+    names collide), so every runner on the machine, in any worker or the
+    CLI, takes an exclusive lock file next to the result store before
+    launching a network. Runs left 'running' by a process that has since
+    exited are marked failed when a runner is created.
+    """
+
+    def __init__(self, store, launchers, parallel=4):
+        self.store = store
+        self.launchers = launchers
+        self.parallel = parallel
+        self.lock_path = store.db_path + '.run.lock'
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sdn-bench')
+        store.fail_orphaned()
+
+    @contextmanager
+    def _network_lock(self):
+        with open(self.lock_path, 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def submit(self, topology, launcher, probes=PROBE_KINDS, duration=5, label=None):
+        if launcher not in self.launchers:
+            raise BenchmarkError(f"Launcher '{launcher}' is not available")
+        unknown = set(probes) - set(PROBE_KINDS)
+        if not probes or unknown:
+            raise BenchmarkError('Choose at least one of: ' + ', '.join(PROBE_KINDS))
+        run_id = self.store.create_run(topology, launcher, probes, duration, label)
+        self._executor.submit(self.execute, run_id, topology, launcher, probes, duration)
+        return run_id
+
+    def execute(self, run_id, topology, launcher, probes, duration):
+        started = time.monotonic()
+        try:
+            columns = {name: [] for name, _ in SAMPLE_COLUMNS}
+            with self._network_lock(), self.launchers[launcher].launch(topology) as net:
+                jobs = [(kind, src, dst, hops) for kind in probes for src, dst, hops in net.pairs()]
+                with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+                    results = pool.map(lambda job: (job, net.probe(*job, duration)), jobs)
+                    for (kind, src, dst, hops), samples in results:
+                        for t, value in samples:
+                            for name, item in zip(('probe', 'src', 'dst', 'hops', 't', 'value'),
+                                                  (kind, src, dst, hops, t, value)):
+                                columns[name].append(item)
+            self.store.finish(run_id, columns)
+            logging.debug(f"[BenchmarkRunner.execute] Run {run_id} ({topology['name']}, {launcher}) finished in "
+                          f"{time.monotonic() - started:.1f}s with {len(columns['value'])} samples")
+        except Exception as e:
+            logging.exception(f"[BenchmarkRunner.execute] Run {run_id} failed")
+            self.store.fail(run_id, str(e))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark an SDN-WAN lab topology.')
+    parser.add_argument('--kind', choices=TOPOLOGY_KINDS, default='dumbbell')
+    parser.add_argument('--hosts', type=int, default=2)
+    parser.add_argument('--delay', type=float, default=20, help='one-way WAN delay in ms')
+    parser.add_argument('--loss', type=float, default=0, help='WAN loss in percent')
+    parser.add_argument('--bw', type=float, default=10, help='WAN bandwidth in Mbit/s')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per probe')
+    parser.add_argument('--launcher', default='mininet' if Mininet is not None else 'synthetic')
+    parser.add_argument('--controller', help='remote controller as ip[:port]')
+    parser.add_argument('--label')
+    parser.add_argument('--db', default=os.path.join('instance', 'sdn_bench.db'))
+    args = parser.parse_args()
+
+    store = ResultStore(args.db)
+    topology = parse_topology({'kind': args.kind, 'hosts': args.hosts, 'delay_ms': args.delay,
+                               'loss_pct': args.loss, 'bandwidth_mbps': args.bw})
+    launchers = available_launchers(args.controller)
+    if args.launcher not in launchers:
+        parser.error(f"launcher '{args.launcher}' is not available")
+    run_id = store.create_run(topology, args.launcher, PROBE_KINDS, args.duration, args.label)
+    BenchmarkRunner(store, launchers).execute(run_id, topology, args.launcher, PROBE_KINDS, args.duration)
+    run = store.run(run_id)
+    print(f"run {run_id} {run['status']}: {topology['name']} via {args.launcher}")
+    for row in store.pair_summary(run_id):
+        print(f"  {row['probe']:10} {row['src']:>3} -> {row['dst']:<3} n={row['count']:<4} "
+              f"p50={row.get('p50', '-')} p95={row.get('p95', '-')}")
@@ -0,0 +1,164 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from markupsafe import Markup, escape
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+SNIPPET_START, SNIPPET_END = '\x02', '\x03'
+
+# Student submissions are private to the student and the teacher
+EXCLUDED_DIRS = {'assignments'}
+
+
+def _xml_text(xml):
+    xml = re.sub(r'</(w:p|a:p)>', '\n', xml)
+    return re.sub(r'<[^>]+>', '', xml)
+
+
+def extract_text(path):
+    """Plain text of a .txt, .docx, .pptx or (with pypdf installed) .pdf file; None otherwise."""
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if extension == 'txt':
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    if extension == 'docx':
+        with zipfile.ZipFile(path) as z:
+            return _xml_text(z.read('word/document.xml').decode('utf-8', 'replace'))
+    if extension == 'pptx':
+        with zipfile.ZipFile(path) as z:
+            slides = sorted(n for n in z.namelist() if re.match(r'ppt/slides/slide\d+\.xml$', n))
+            return '\n'.join(_xml_text(z.read(n).decode('utf-8', 'replace')) for n in slides)
+    if extension == 'pdf' and PdfReader is not None:
+        return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+    return None
+
+
+def _fts_query(text):
+    # Quote every word so user input can never be parsed as FTS5 syntax
+    terms = re.findall(r'\w+', text)
+    return ' '.join('"{}"'.format(t.replace('"', '""')) for t in terms)
+
+
+class SearchIndex:
+    """Full-text index of course content in an SQLite FTS5 table.
+
+    Storage keys are queued with ``enqueue`` as upload routes write them; a
+    small thread pool reads each file through ``storage`` (staging remote
+    objects to a temp file), extracts its text and merges it into the index,
+    so searches never touch the storage backend.
+    """
+
+    def __init__(self, db_path, storage, workers=2):
+        self.db_path = db_path
+        self.storage = storage
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search-index')
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+                title, body, course_id UNINDEXED, path UNINDEXED,
+                tokenize = 'porter unicode61'
+            );
+            CREATE TABLE IF NOT EXISTS indexed_files (
+                path TEXT PRIMARY KEY, size INTEGER, etag TEXT
+            );
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(indexed_files)")}
+        if 'etag' not in columns:
+            # Indexes from before storage backends tracked mtimes; those files are re-read once
+            conn.execute("ALTER TABLE indexed_files ADD COLUMN etag TEXT")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, key):
+        """Schedule the storage ``key`` for indexing in the background."""
+        return self._executor.submit(self._index_file_logged, key)
+
+    def _index_file_logged(self, key):
+        try:
+            self.index_file(key)
+        except Exception:
+            logging.exception(f"[SearchIndex.index_file] Failed to index {key}")
+
+    def index_file(self, key, stat=None):
+        parts = key.split('/')
+        if len(parts) < 2 or EXCLUDED_DIRS.intersection(parts[1:-1]):
+            return False
+        st = stat or self.storage.stat(key)
+        if st is None:
+            self.remove(key)
+            return False
+
+        conn = self._connection()
+        row = conn.execute("SELECT size, etag FROM indexed_files WHERE path = ?", (key,)).fetchone()
+        if row == (st.size, st.etag):
+            return False
+
+        try:
+            with self.storage.local_copy(key) as path:
+                text = extract_text(path)
+        except FileNotFoundError:
+            self.remove(key)
+            return False
+        if text is None:
+            return False
+        title = parts[-1]
+        if parts[1] == 'announcements' and text.startswith('Title: '):
+            title = text.split('\n', 1)[0][len('Title: '):]
+
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM documents WHERE path = ?", (key,))
+            conn.execute("INSERT INTO documents (title, body, course_id, path) VALUES (?, ?, ?, ?)",
+                         (title, text, parts[0], key))
+            conn.execute("INSERT OR REPLACE INTO indexed_files (path, size, etag) VALUES (?, ?, ?)",
+                         (key, st.size, st.etag))
+        return True
+
+    def remove(self, key):
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute("DELETE FROM documents WHERE path = ?", (key,))
+            conn.execute("DELETE FROM indexed_files WHERE path = ?", (key,))
+
+    def reindex_all(self):
+        """Index every file in storage; unchanged files are skipped."""
+        indexed = 0
+        for key, st in self.storage.walk(''):
+            indexed += self.index_file(key, st)
+        return indexed
+
+    def search(self, text, course_id=None, limit=20):
+        """Best matches first, as dicts with course_id, path, title and a highlighted snippet."""
+        query = _fts_query(text)
+        if not query:
+            return []
+        sql = ("SELECT course_id, path, title, snippet(documents, 1, ?, ?, '…', 16) "
+               "FROM documents WHERE documents MATCH ?")
+        params = [SNIPPET_START, SNIPPET_END, query]
+        if course_id:
+            sql += " AND course_id = ?"
+            params.append(course_id)
+        sql += " ORDER BY bm25(documents, 5.0, 1.0) LIMIT ?"
+        params.append(limit)
+        results = []
+        for course, path, title, snippet in self._connection().execute(sql, params):
+            snippet = str(escape(snippet)).replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>')
+            results.append({'course_id': course, 'path': path, 'title': title, 'snippet': Markup(snippet)})
+        return results
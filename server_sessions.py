@@ -0,0 +1,219 @@
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Flashes that are never displayed would otherwise pile up in the session forever
+MAX_FLASHES = 20
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, version=0, expires=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.version = version
+        self.expires = expires
+        self.modified = False
+        self.initial_user = self.get('user_id')
+
+
+class SQLiteSessionStore:
+    """Session rows in an SQLite file shared by all workers, with a per-worker LRU in front.
+
+    The LRU holds serialized sessions by id and version. A cache hit costs one
+    lookup in the (sid, version, expires) covering index, and the session
+    blob is only read again when another worker has written a newer version.
+    """
+
+    def __init__(self, db_path, cache_size=10000):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY, data TEXT NOT NULL, version INTEGER NOT NULL, expires REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_sessions_version ON sessions (sid, version, expires);
+            CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires);
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, sid, version, expires, data):
+        with self._lock:
+            self._cache[sid] = (version, expires, data)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def load(self, sid):
+        """(serialized data, version, expires) for a live session, or None."""
+        conn = self._connection()
+        row = conn.execute("SELECT version, expires FROM sessions INDEXED BY ix_sessions_version "
+                           "WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] < time.time():
+            self.forget(sid)
+            return None
+        version, expires = row
+        with self._lock:
+            cached = self._cache.get(sid)
+        if cached and cached[0] == version:
+            return cached[2], version, expires
+        row = conn.execute("SELECT data, version, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None:
+            return None
+        self._remember(sid, row[1], row[2], row[0])
+        return row
+
+    def save(self, sid, data, expires):
+        """Write the session and return the version the database gave it."""
+        conn = self._connection()
+        # Incremented in SQL: two workers saving the same session never end up holding one version
+        # with different data, so a cached blob always matches the row it was written as
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO sessions (sid, data, version, expires) VALUES (?, ?, 1, ?) "
+                         "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, version = version + 1, "
+                         "expires = excluded.expires", (sid, data, expires))
+            version = conn.execute("SELECT version FROM sessions WHERE sid = ?", (sid,)).fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._remember(sid, version, expires, data)
+        return version
+
+    def touch(self, sid, version, expires):
+        self._connection().execute("UPDATE sessions SET expires = ? WHERE sid = ? AND version = ?",
+                                   (expires, sid, version))
+
+    def delete(self, sid):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        self.forget(sid)
+
+    def forget(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def purge_expired(self):
+        """Drop every expired session in one statement; returns how many went."""
+        return self._connection().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data server-side; the cookie carries only an opaque random id.
+
+    Unmodified sessions are not written back, and their expiry is only pushed
+    forward once half of it has elapsed, so an ordinary page view costs one
+    index lookup however much the session holds. The id is rotated whenever
+    the logged-in user changes.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, idle_timeout):
+        self.store = store
+        self.idle_timeout = idle_timeout
+
+    def _lifetime(self, app, session):
+        return app.permanent_session_lifetime.total_seconds() if session.permanent else self.idle_timeout
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            try:
+                loaded = self.store.load(sid)
+            except sqlite3.Error:
+                logging.exception("[ServerSideSessionInterface] Session load failed")
+                loaded = None
+            if loaded:
+                data, version, expires = loaded
+                return ServerSideSession(self.serializer.loads(data), sid=sid, version=version, expires=expires)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if not session.new and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        rotate = not session.new and session.get('user_id') != session.initial_user
+        if rotate:
+            # A new login (or logout) must not keep using an id the client had before
+            self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+
+        now = time.time()
+        lifetime = self._lifetime(app, session)
+        if session.modified or session.new or rotate:
+            if len(session.get('_flashes', ())) > MAX_FLASHES:
+                session['_flashes'] = session['_flashes'][-MAX_FLASHES:]
+            session.expires = now + lifetime
+            session.version = self.store.save(session.sid, self.serializer.dumps(dict(session)), session.expires)
+        elif session.expires - now < lifetime / 2:
+            session.expires = now + lifetime
+            self.store.touch(session.sid, session.version, session.expires)
+        else:
+            response.vary.add('Cookie')
+            return
+
+        response.vary.add('Cookie')
+        expires = datetime.fromtimestamp(session.expires, timezone.utc) if session.permanent else None
+        response.set_cookie(name, session.sid, expires=expires, httponly=self.get_cookie_httponly(app),
+                            domain=domain, path=path, secure=self.get_cookie_secure(app),
+                            samesite=self.get_cookie_samesite(app))
+
+
+def start_session_purge(store, interval):
+    """Run ``store.purge_expired`` every ``interval`` seconds in a daemon thread."""
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                purged = store.purge_expired()
+                logging.debug(f"[start_session_purge] Purged {purged} expired session(s)")
+            except Exception:
+                logging.exception("[start_session_purge] Session purge failed")
+
+    thread = threading.Thread(target=loop, name='session-purge', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_server_sessions(app):
+    """Switch the app to server-side sessions unless SESSION_BACKEND is 'cookie'."""
+    if app.config.get('SESSION_BACKEND', 'server') == 'cookie':
+        return None
+    store = SQLiteSessionStore(app.config.get('SESSION_DB_PATH') or os.path.join(app.instance_path, 'sessions.db'),
+                               cache_size=app.config.get('SESSION_CACHE_SIZE', 10000))
+    app.session_interface = ServerSideSessionInterface(store, app.config.get('SESSION_IDLE_TIMEOUT', 24 * 3600))
+    start_session_purge(store, app.config.get('SESSION_PURGE_INTERVAL', 600))
+    return store
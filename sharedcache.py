@@ -0,0 +1,151 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+_MISSING = object()
+
+
+class GenerationStore:
+    """Generation counters in an SQLite file shared by every worker using it.
+
+    Writers ``bump`` a key; readers compare the counter with the one their
+    cached value was built at. This keeps the workers of a single host
+    coherent: WAL mode relies on shared memory, so the file must not be put
+    on a network filesystem to span machines (see DatabaseGenerationStore).
+    """
+
+    errors = (sqlite3.Error,)
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS generations (key TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, keys):
+        """Current generation of each key, as a tuple; unknown keys are 0."""
+        placeholders = ','.join('?' * len(keys))
+        rows = dict(self._connection().execute(
+            f"SELECT key, generation FROM generations WHERE key IN ({placeholders})", list(keys)).fetchall())
+        return tuple(rows.get(key, 0) for key in keys)
+
+    def bump(self, *keys):
+        conn = self._connection()
+        conn.executemany("INSERT INTO generations (key, generation) VALUES (?, 1) "
+                         "ON CONFLICT(key) DO UPDATE SET generation = generation + 1", [(k,) for k in keys])
+
+
+class DatabaseGenerationStore:
+    """Generation counters in a table of a SQLAlchemy database, for workers on several hosts.
+
+    Same interface as GenerationStore. Every worker pointed at one database
+    server (e.g. the app's PostgreSQL) sees every bump, at the cost of a
+    round trip to it per cache lookup.
+    """
+
+    errors = (SQLAlchemyError,)
+
+    def __init__(self, engine, table_name='cache_generations'):
+        self.engine = engine
+        metadata = MetaData()
+        self.table = Table(table_name, metadata,
+                           Column('key', String(255), primary_key=True),
+                           Column('generation', Integer, nullable=False))
+        metadata.create_all(engine)
+
+    def get(self, keys):
+        """Current generation of each key, as a tuple; unknown keys are 0."""
+        with self.engine.connect() as conn:
+            rows = dict(conn.execute(select(self.table.c.key, self.table.c.generation)
+                                     .where(self.table.c.key.in_(keys))).all())
+        return tuple(rows.get(key, 0) for key in keys)
+
+    def _increment(self, key):
+        with self.engine.begin() as conn:
+            return conn.execute(update(self.table).where(self.table.c.key == key)
+                                .values(generation=self.table.c.generation + 1)).rowcount
+
+    def bump(self, *keys):
+        # UPDATE, then INSERT for new keys: an upsert every dialect runs the same way
+        for key in keys:
+            if self._increment(key):
+                continue
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(self.table).values(key=key, generation=1))
+            except IntegrityError:
+                # Another worker created it first; this bump still counts
+                self._increment(key)
+
+
+class SharedCache:
+    """Per-worker LRU whose entries are valid only while their generations are unchanged.
+
+    Each entry records the generations of the keys it depends on; a lookup
+    re-reads those generations (one indexed query) and recomputes on any
+    mismatch, so a bump on any worker invalidates the entry everywhere.
+    Entries also expire after ``default_ttl`` seconds unless a shorter ``ttl``
+    is given, which bounds staleness if a bump is ever lost.
+    """
+
+    def __init__(self, generations, maxsize=1024, default_ttl=300):
+        self.generations = generations
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _current(self, deps):
+        try:
+            return self.generations.get(deps)
+        except self.generations.errors:
+            logging.exception("[SharedCache] Generation lookup failed; bypassing cache")
+            return None
+
+    def get_or_set(self, key, deps, compute, ttl=None):
+        """Cached ``compute()`` for ``key``, rebuilt when any of ``deps`` is bumped or ``ttl`` expires."""
+        deps = tuple(deps)
+        ttl = ttl or self.default_ttl
+        current = self._current(deps)
+        if current is None:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] == current and (entry[1] is None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = (current, time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def bump(self, *deps):
+        try:
+            self.generations.bump(*deps)
+        except self.generations.errors:
+            logging.exception(f"[SharedCache] Could not bump {deps}")
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
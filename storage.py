@@ -0,0 +1,511 @@
+import logging
+import mimetypes
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+    class ClientError(Exception):
+        # Same shape as botocore's, so LocalObjectStore works without it
+        def __init__(self, error_response, operation_name):
+            super().__init__(f"{operation_name}: {error_response['Error']['Code']}")
+            self.response = error_response
+            self.operation_name = operation_name
+
+StorageStat = namedtuple('StorageStat', ['size', 'mtime', 'etag'])
+
+CHUNK_SIZE = 256 * 1024
+
+
+class _CountingReader:
+    # Counts the bytes a backend pulls through, for usage accounting
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.fileobj.read(n)
+        self.size += len(data)
+        return data
+
+
+class InvalidKey(ValueError):
+    """Raised for keys that are empty or try to escape the storage root."""
+
+
+def normalize_key(key):
+    key = posixpath.normpath(key.replace('\\', '/')).lstrip('/')
+    if key in ('', '.') or key == '..' or key.startswith('../'):
+        raise InvalidKey(key)
+    return key
+
+
+class Storage:
+    """Interface for uploaded course files, addressed by '/'-separated keys.
+
+    Keys look like 'PROG1001/announcements/20250623184338_lol.txt'. ``list``
+    returns the immediate children of a prefix (files and sub-"directories"),
+    like os.listdir, and its results are cached for ``list_cache_ttl`` seconds.
+    Writes through this object invalidate the affected listings at once; with
+    a SharedCache, writes on any worker do, via the top-level prefix's
+    generation (see ``generation_key``).
+
+    With a ``usage`` ledger (see storage_usage.py) every write and delete is
+    also recorded against the course and the ``owner`` passed in.
+    """
+
+    def __init__(self, list_cache_ttl=30, cache=None, usage=None):
+        self.list_cache_ttl = list_cache_ttl
+        self.cache = cache
+        self.usage = usage
+        self._list_cache = {}
+        self._list_lock = threading.Lock()
+
+    # Backend hooks
+    def _put_fileobj(self, key, fileobj):
+        raise NotImplementedError
+
+    def _put_file(self, key, path):
+        with open(path, 'rb') as f:
+            self._put_fileobj(key, f)
+
+    def _list(self, prefix):
+        raise NotImplementedError
+
+    def open(self, key):
+        """Binary file-like object for reading ``key``; raises FileNotFoundError."""
+        raise NotImplementedError
+
+    def stat(self, key):
+        """StorageStat for ``key``, or None if it does not exist."""
+        raise NotImplementedError
+
+    def _delete(self, key):
+        raise NotImplementedError
+
+    def walk(self, prefix):
+        """Yield (key, StorageStat) for every object below ``prefix`` ('' for all), sorted by key."""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path of ``key`` when the backend keeps files on local disk, else None."""
+        return None
+
+    # Public API
+    def put(self, key, fileobj, owner=None):
+        key = normalize_key(key)
+        reader = _CountingReader(fileobj)
+        self._put_fileobj(key, reader)
+        self._invalidate(key)
+        self._account(key, reader.size, owner)
+        return key
+
+    def put_bytes(self, key, data, owner=None):
+        key = normalize_key(key)
+        with tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE) as f:
+            f.write(data)
+            f.seek(0)
+            self._put_fileobj(key, f)
+        self._invalidate(key)
+        self._account(key, len(data), owner)
+        return key
+
+    def put_file(self, key, path, owner=None):
+        """Store the local file at ``path``; the file may be moved rather than copied."""
+        key = normalize_key(key)
+        size = os.path.getsize(path)
+        self._put_file(key, path)
+        self._invalidate(key)
+        self._account(key, size, owner)
+        return key
+
+    def get(self, key):
+        with self.open(normalize_key(key)) as f:
+            return f.read()
+
+    def exists(self, key):
+        return self.stat(normalize_key(key)) is not None
+
+    @contextmanager
+    def local_copy(self, key):
+        """Path of ``key`` as a local file: the file itself on disk backends, else a temp copy removed afterwards."""
+        key = normalize_key(key)
+        path = self.local_path(key)
+        if path is not None:
+            yield path
+            return
+        # Keep the extension; text extraction and previews go by it
+        fd, tmp_path = tempfile.mkstemp(suffix=posixpath.splitext(key)[1])
+        try:
+            with os.fdopen(fd, 'wb') as out, self.open(key) as src:
+                shutil.copyfileobj(src, out, CHUNK_SIZE)
+            yield tmp_path
+        finally:
+            os.remove(tmp_path)
+
+    def stream(self, key, chunk_size=CHUNK_SIZE):
+        """Generator over the bytes of ``key``, one chunk at a time."""
+        f = self.open(normalize_key(key))
+        try:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                yield block
+        finally:
+            f.close()
+
+    def delete(self, key):
+        key = normalize_key(key)
+        self._delete(key)
+        self._invalidate(key)
+        self._account(key, None, None)
+
+    @staticmethod
+    def generation_key(key):
+        """SharedCache generation bumped by every write below ``key``'s top-level prefix (the course)."""
+        return f"storage:{normalize_key(key).split('/')[0]}"
+
+    def list(self, prefix):
+        prefix = normalize_key(prefix)
+        if self.cache is not None:
+            return list(self.cache.get_or_set(('storage.list', prefix), [self.generation_key(prefix)],
+                                              lambda: sorted(self._list(prefix)), ttl=self.list_cache_ttl))
+        now = time.monotonic()
+        with self._list_lock:
+            cached = self._list_cache.get(prefix)
+            if cached and cached[0] > now:
+                return list(cached[1])
+        names = sorted(self._list(prefix))
+        with self._list_lock:
+            self._list_cache[prefix] = (now + self.list_cache_ttl, names)
+        return list(names)
+
+    def _account(self, key, size, owner):
+        if self.usage is None:
+            return
+        try:
+            if size is None:
+                self.usage.remove(key)
+            else:
+                self.usage.record(key, size, owner)
+        except Exception:
+            # The file itself is stored; the next reconciliation scan corrects the counters
+            logging.exception(f"[Storage._account] Could not record usage for {key}")
+
+    def _invalidate(self, key):
+        if self.cache is not None:
+            self.cache.bump(self.generation_key(key))
+            return
+        # Every ancestor listing may have gained a new child
+        with self._list_lock:
+            parent = posixpath.dirname(key)
+            while parent:
+                self._list_cache.pop(parent, None)
+                parent = posixpath.dirname(parent)
+
+
+class LocalStorage(Storage):
+    """Files under a directory on local disk (the historical UPLOAD_FOLDER layout)."""
+
+    def __init__(self, root, list_cache_ttl=30, cache=None, usage=None):
+        super().__init__(list_cache_ttl, cache, usage)
+        self.root = root
+
+    def __repr__(self):
+        return f"LocalStorage({self.root!r})"
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def local_path(self, key):
+        return self._path(normalize_key(key))
+
+    def _put_fileobj(self, key, fileobj):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write beside the target and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _put_file(self, key, path):
+        dest = self._path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.move(path, dest)
+
+    def _list(self, prefix):
+        try:
+            return [name for name in os.listdir(self._path(prefix)) if not name.endswith('.tmp')]
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    def open(self, key):
+        return open(self._path(normalize_key(key)), 'rb')
+
+    def stat(self, key):
+        try:
+            st = os.stat(self._path(normalize_key(key)))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return StorageStat(st.st_size, st.st_mtime, f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+    def _delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def walk(self, prefix):
+        prefix = normalize_key(prefix) if prefix else ''
+
+        def scan(path, key_prefix):
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except (FileNotFoundError, NotADirectoryError):
+                return
+            for entry in entries:
+                key = f"{key_prefix}/{entry.name}" if key_prefix else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    yield from scan(entry.path, key)
+                elif entry.is_file(follow_symlinks=False) and not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    yield key, StorageStat(st.st_size, st.st_mtime, f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+        yield from scan(self._path(prefix) if prefix else self.root, prefix)
+
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket.
+
+    ``endpoint_url`` points the client at another S3 API such as MinIO;
+    ``client`` replaces boto3 altogether, e.g. with a LocalObjectStore.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, list_cache_ttl=30, cache=None,
+                 usage=None, client=None):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("STORAGE_BACKEND='s3' requires the boto3 package")
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        super().__init__(list_cache_ttl, cache, usage)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.client = client
+
+    def __repr__(self):
+        return f"S3Storage('s3://{self.bucket}/{self.prefix}')"
+
+    def _object_key(self, key):
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _put_fileobj(self, key, fileobj):
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        # upload_fileobj switches to multipart uploads for large bodies
+        self.client.upload_fileobj(fileobj, self.bucket, self._object_key(key),
+                                   ExtraArgs={'ContentType': content_type})
+
+    def _put_file(self, key, path):
+        with open(path, 'rb') as f:
+            self._put_fileobj(key, f)
+        os.remove(path)
+
+    def _list(self, prefix):
+        names = set()
+        paginator = self.client.get_paginator('list_objects_v2')
+        object_prefix = self._object_key(prefix) + '/'
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=object_prefix, Delimiter='/'):
+            for common in page.get('CommonPrefixes', []):
+                names.add(common['Prefix'][len(object_prefix):].rstrip('/'))
+            for obj in page.get('Contents', []):
+                names.add(obj['Key'][len(object_prefix):])
+        names.discard('')
+        return list(names)
+
+    def open(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._object_key(normalize_key(key)))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise FileNotFoundError(key)
+            raise
+        # StreamingBody reads from the socket on demand
+        return response['Body']
+
+    def stat(self, key):
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(normalize_key(key)))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404', 'NotFound'):
+                return None
+            raise
+        return StorageStat(head['ContentLength'], head['LastModified'].timestamp(), head['ETag'].strip('"'))
+
+    def _delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def walk(self, prefix):
+        paginator = self.client.get_paginator('list_objects_v2')
+        if prefix:
+            object_prefix = self._object_key(normalize_key(prefix)) + '/'
+        else:
+            object_prefix = f"{self.prefix}/" if self.prefix else ''
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=object_prefix):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][strip:], StorageStat(obj['Size'], obj['LastModified'].timestamp(),
+                                                      obj['ETag'].strip('"'))
+
+
+class _Paginator:
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self.method(**kwargs)
+            yield page
+            if not page['IsTruncated']:
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+
+class LocalObjectStore:
+    """The part of the boto3 S3 client that S3Storage uses, over a local directory.
+
+    Each bucket is a directory under ``root`` and each object a file at its
+    key, written by rename like LocalStorage. With S3_ENDPOINT_URL set to
+    ``file:///some/dir`` the S3 backend runs against it, without boto3 or a
+    bucket, which is how its code paths are tried out locally.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *normalize_key(key).split('/'))
+
+    @staticmethod
+    def _not_found(code, operation):
+        return ClientError({'Error': {'Code': code, 'Message': 'Not Found'}}, operation)
+
+    @staticmethod
+    def _etag(st):
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(fileobj, out, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def get_object(self, Bucket, Key):
+        try:
+            f = open(self._path(Bucket, Key), 'rb')
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            raise self._not_found('NoSuchKey', 'GetObject')
+        st = os.fstat(f.fileno())
+        return {'Body': f, 'ContentLength': st.st_size, 'ETag': self._etag(st),
+                'LastModified': datetime.fromtimestamp(st.st_mtime, timezone.utc)}
+
+    def head_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        try:
+            st = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            raise self._not_found('404', 'HeadObject')
+        if not os.path.isfile(path):
+            raise self._not_found('404', 'HeadObject')
+        return {'ContentLength': st.st_size, 'ETag': self._etag(st),
+                'LastModified': datetime.fromtimestamp(st.st_mtime, timezone.utc)}
+
+    def delete_object(self, Bucket, Key):
+        # Like S3, deleting a missing key succeeds
+        try:
+            os.remove(self._path(Bucket, Key))
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError):
+            pass
+        return {}
+
+    def _objects(self, bucket, prefix):
+        # Only the directory the prefix names can hold matches, so start the scan there
+        base = os.path.join(self.root, bucket)
+        start = prefix.rsplit('/', 1)[0] if '/' in prefix else ''
+        top = os.path.join(base, *start.split('/')) if start else base
+        for dirpath, _, filenames in os.walk(top):
+            rel = os.path.relpath(dirpath, base).replace(os.sep, '/')
+            for name in filenames:
+                key = name if rel == '.' else f"{rel}/{name}"
+                if key.startswith(prefix) and not name.endswith('.tmp'):
+                    yield key, os.path.join(dirpath, name)
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, ContinuationToken=None, MaxKeys=1000):
+        contents, prefixes = [], set()
+        entries = []
+        for key, path in sorted(self._objects(Bucket, Prefix)):
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                common = Prefix + rest[:rest.index(Delimiter) + len(Delimiter)]
+                if common not in prefixes:
+                    prefixes.add(common)
+                    entries.append(('prefix', common, None))
+                continue
+            entries.append(('key', key, path))
+        # Tokens are opaque to callers; an offset is enough for a local store
+        start = int(ContinuationToken or 0)
+        page = entries[start:start + MaxKeys]
+        for kind, name, path in page:
+            if kind == 'prefix':
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            contents.append({'Key': name, 'Size': st.st_size, 'ETag': self._etag(st),
+                             'LastModified': datetime.fromtimestamp(st.st_mtime, timezone.utc)})
+        truncated = start + MaxKeys < len(entries)
+        response = {'Contents': contents, 'CommonPrefixes': [{'Prefix': name} for kind, name, _ in page if kind == 'prefix'],
+                    'KeyCount': len(page), 'IsTruncated': truncated}
+        if truncated:
+            response['NextContinuationToken'] = str(start + MaxKeys)
+        return response
+
+    def get_paginator(self, operation_name):
+        return _Paginator(getattr(self, operation_name))
+
+
+def create_storage(config, cache=None, usage=None):
+    backend = config.get('STORAGE_BACKEND', 'local')
+    ttl = config.get('STORAGE_LIST_CACHE_TTL', 30)
+    if backend == 's3':
+        endpoint_url = config.get('S3_ENDPOINT_URL')
+        client = None
+        if endpoint_url and endpoint_url.startswith('file://'):
+            client = LocalObjectStore(endpoint_url[len('file://'):])
+        logging.debug(f"[create_storage] Using S3 bucket '{config['S3_BUCKET']}' at {endpoint_url or 'AWS'}")
+        return S3Storage(config['S3_BUCKET'], prefix=config.get('S3_PREFIX') or '',
+                         endpoint_url=endpoint_url, region=config.get('S3_REGION'),
+                         list_cache_ttl=ttl, cache=cache, usage=usage, client=client)
+    if backend != 'local':
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}'")
+    return LocalStorage(config['UPLOAD_FOLDER'], list_cache_ttl=ttl, cache=cache, usage=usage)
@@ -0,0 +1,227 @@
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+class QuotaExceeded(Exception):
+    """Raised when storing a file would take a course or user past its quota."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def parse_quota_overrides(value):
+    """'PROG1001=5000000000,MATH2001=0' -> {'PROG1001': 5000000000, 'MATH2001': 0}."""
+    overrides = {}
+    for item in (value or '').split(','):
+        name, sep, limit = item.partition('=')
+        if sep and name.strip():
+            overrides[name.strip()] = int(limit)
+    return overrides
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class UsageLedger:
+    """Bytes and file counts per course and per user, kept up to date by every storage write.
+
+    Each stored key has a row recording its size and owner, and the totals
+    live in a small ``usage`` table adjusted by the difference on every write,
+    overwrite and delete. Quota checks and the admin report therefore read a
+    handful of rows instead of walking the upload tree. ``reconcile`` rebuilds
+    both tables from a full scan to correct any drift.
+    """
+
+    def __init__(self, db_path, course_quota=0, user_quota=0, course_overrides=None):
+        self.db_path = db_path
+        self.course_quota = course_quota
+        self.user_quota = user_quota
+        self.course_overrides = course_overrides or {}
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                key TEXT PRIMARY KEY, course TEXT NOT NULL, owner TEXT, size INTEGER NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS usage (
+                scope TEXT NOT NULL, name TEXT NOT NULL, bytes INTEGER NOT NULL, files INTEGER NOT NULL,
+                PRIMARY KEY (scope, name)
+            );
+        """)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _course(key):
+        return key.split('/')[0]
+
+    @staticmethod
+    def _adjust(conn, scope, name, size, files):
+        conn.execute("INSERT INTO usage (scope, name, bytes, files) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT(scope, name) DO UPDATE SET bytes = bytes + excluded.bytes, "
+                     "files = files + excluded.files", (scope, name, size, files))
+
+    def record(self, key, size, owner=None):
+        """Account for ``key`` now holding ``size`` bytes; an overwrite only adds the difference."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size, owner FROM files WHERE key = ?", (key,)).fetchone()
+            if old and owner is None:
+                # Rewrites without a known owner (e.g. system imports) keep the original one
+                owner = old[1]
+            conn.execute("INSERT OR REPLACE INTO files (key, course, owner, size, updated) VALUES (?, ?, ?, ?, ?)",
+                         (key, self._course(key), owner, size, time.time()))
+            old_size, old_owner = old if old else (0, None)
+            self._adjust(conn, 'course', self._course(key), size - old_size, 0 if old else 1)
+            if old_owner is not None:
+                self._adjust(conn, 'user', old_owner, -old_size, -1)
+            if owner is not None:
+                self._adjust(conn, 'user', owner, size, 1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove(self, key):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            old = conn.execute("SELECT size, owner FROM files WHERE key = ?", (key,)).fetchone()
+            if old:
+                conn.execute("DELETE FROM files WHERE key = ?", (key,))
+                self._adjust(conn, 'course', self._course(key), -old[0], -1)
+                if old[1] is not None:
+                    self._adjust(conn, 'user', old[1], -old[0], -1)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def usage(self, scope, name):
+        """(bytes, files) used by one course or user."""
+        row = self._connection().execute("SELECT bytes, files FROM usage WHERE scope = ? AND name = ?",
+                                         (scope, name)).fetchone()
+        return tuple(row) if row else (0, 0)
+
+    def quota(self, scope, name):
+        """Byte limit for a course or user; 0 means unlimited."""
+        if scope == 'course':
+            return self.course_overrides.get(name, self.course_quota)
+        return self.user_quota
+
+    def check(self, course, size, owner=None, key=None):
+        """Raise QuotaExceeded unless ``size`` more bytes fit both the course's and the owner's quota.
+
+        Runs before an upload is stored. When it will overwrite ``key``, the
+        bytes that key holds now are credited back.
+        """
+        row = None
+        if key is not None:
+            row = self._connection().execute("SELECT size, owner FROM files WHERE key = ?", (key,)).fetchone()
+        replaced, replaced_owner = row if row else (0, None)
+        limit = self.quota('course', course)
+        if limit and self.usage('course', course)[0] - replaced + size > limit:
+            raise QuotaExceeded(f"This upload would take course {course} past its storage quota of {format_bytes(limit)}.")
+        limit = self.quota('user', owner)
+        if owner is not None and limit:
+            used = self.usage('user', owner)[0] - (replaced if replaced_owner == owner else 0)
+            if used + size > limit:
+                raise QuotaExceeded(f"This upload would exceed your storage quota of {format_bytes(limit)}.")
+
+    def report(self, scope, limit=None):
+        """Largest consumers in ``scope`` as dicts, for the admin usage page."""
+        sql = "SELECT name, bytes, files FROM usage WHERE scope = ? AND files > 0 ORDER BY bytes DESC"
+        args = [scope]
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [{'name': name, 'bytes': size, 'files': files, 'quota': self.quota(scope, name)}
+                for name, size, files in self._connection().execute(sql, args)]
+
+    def reconcile(self, entries):
+        """Rebuild the ledger from ``entries``, an iterable of (key, size) covering all of storage.
+
+        Rows written while the scan was running are left alone, so uploads
+        racing the scan are neither dropped nor counted twice. Returns the
+        number of files whose recorded size was wrong or missing.
+        """
+        started = time.time()
+        conn = self._connection()
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS scanned (key TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+        conn.execute("DELETE FROM scanned")
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO scanned (key, size) VALUES (?, ?)", entries)
+        conn.execute("COMMIT")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fixed = conn.execute("DELETE FROM files WHERE updated < ? AND key NOT IN (SELECT key FROM scanned)",
+                                 (started,)).rowcount
+            fixed += conn.execute("UPDATE files SET size = (SELECT size FROM scanned WHERE scanned.key = files.key) "
+                                  "WHERE updated < ? AND size != (SELECT size FROM scanned WHERE scanned.key = files.key)",
+                                  (started,)).rowcount
+            scanned = conn.execute("SELECT key, size FROM scanned WHERE key NOT IN (SELECT key FROM files)").fetchall()
+            conn.executemany("INSERT INTO files (key, course, owner, size, updated) VALUES (?, ?, NULL, ?, ?)",
+                             [(key, self._course(key), size, started) for key, size in scanned])
+            fixed += len(scanned)
+            conn.execute("DELETE FROM usage")
+            conn.execute("INSERT INTO usage (scope, name, bytes, files) "
+                         "SELECT 'course', course, SUM(size), COUNT(*) FROM files GROUP BY course")
+            conn.execute("INSERT INTO usage (scope, name, bytes, files) "
+                         "SELECT 'user', owner, SUM(size), COUNT(*) FROM files WHERE owner IS NOT NULL GROUP BY owner")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.execute("DELETE FROM scanned")
+        return fixed
+
+
+def start_reconciliation(ledger, storage, interval):
+    """Reconcile ``ledger`` against everything in ``storage`` now and every ``interval`` seconds.
+
+    Every worker calls this, but only the one holding a lock file next to the
+    ledger scans; the others retry each interval and take over if it exits.
+    """
+
+    def loop():
+        lock = open(ledger.db_path + '.reconcile.lock', 'w')
+        while True:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                time.sleep(interval)
+        while True:
+            try:
+                started = time.monotonic()
+                fixed = ledger.reconcile((key, st.size) for key, st in storage.walk(''))
+                logging.debug(f"[start_reconciliation] Scanned {type(storage).__name__} in {time.monotonic() - started:.1f}s; "
+                              f"corrected {fixed} file(s)")
+            except Exception:
+                logging.exception("[start_reconciliation] Storage usage reconciliation failed")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='storage-usage-reconcile', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,86 @@
+import hashlib
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+
+
+class _HashingReader:
+    # Wraps an upload stream so size and SHA-256 come for free while it is copied
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n=-1):
+        data = self.fileobj.read(n)
+        self.digest.update(data)
+        self.size += len(data)
+        return data
+
+
+class SubmissionRegistry:
+    """Assignment submissions: one DB row per attempt, files in sharded storage keys.
+
+    Files live under ``<course>/assignments/<shard>/<student>/<assignment>/``,
+    where the shard is derived from the student name, so no directory grows
+    with class size and two students can never overwrite each other. How many
+    submissions are stored at once is bounded by the 'submission' admission
+    lane (see admission.py), not here.
+    """
+
+    def __init__(self, db, model, storage):
+        self.db = db
+        self.Submission = model
+        self.storage = storage
+
+    def storage_key(self, course_id, assignment, student, filename):
+        shard = hashlib.sha1(student.encode('utf-8')).hexdigest()[:2]
+        # A random prefix keeps concurrent attempts from sharing a key
+        return (f"{course_id}/assignments/{shard}/{secure_filename(student) or 'anonymous'}/"
+                f"{secure_filename(assignment) or 'general'}/{uuid.uuid4().hex[:12]}_{filename}")
+
+    def submit(self, course_id, assignment, student, fileobj, filename):
+        """Store the file and record it as the student's next attempt."""
+        reader = _HashingReader(fileobj)
+        key = self.storage.put(self.storage_key(course_id, assignment, student, filename), reader, owner=student)
+        S = self.Submission
+        session = self.db.session
+        for _ in range(3):
+            attempt = session.execute(
+                select(func.coalesce(func.max(S.attempt), 0))
+                .where(S.course_id == course_id, S.assignment == assignment, S.student == student)).scalar() + 1
+            submission = S(course_id=course_id, assignment=assignment, student=student, attempt=attempt,
+                           filename=filename, storage_key=key, size=reader.size,
+                           sha256=reader.digest.hexdigest(), submitted_at=datetime.now())
+            session.add(submission)
+            try:
+                session.commit()
+            except IntegrityError:
+                # Another upload by the same student took this attempt number
+                session.rollback()
+                continue
+            logging.debug(f"[SubmissionRegistry.submit] {student} -> {course_id}/{assignment} attempt {attempt}")
+            return submission
+        self.storage.delete(key)
+        raise RuntimeError(f"Could not record submission for {student} in {course_id}")
+
+    def latest(self, course_id, assignment=None):
+        """Most recent attempt of every student (per assignment), via the attempt index."""
+        S = self.Submission
+        newest = select(S.assignment, S.student, func.max(S.attempt).label('attempt')) \
+            .where(S.course_id == course_id)
+        if assignment is not None:
+            newest = newest.where(S.assignment == assignment)
+        newest = newest.group_by(S.assignment, S.student).subquery()
+        query = select(S).join(newest, and_(S.course_id == course_id, S.assignment == newest.c.assignment,
+                                            S.student == newest.c.student, S.attempt == newest.c.attempt))
+        return self.db.session.scalars(query.order_by(S.assignment, S.student)).all()
+
+    def history(self, course_id, student):
+        S = self.Submission
+        return S.query.filter_by(course_id=course_id, student=student) \
+            .order_by(S.assignment, S.attempt.desc()).all()
@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+import time
+
+from flask import jsonify
+from jinja2 import FileSystemBytecodeCache
+
+warmup_state = {'ready': False, 'started_at': None, 'duration_ms': None, 'failed_tasks': []}
+_warmup_tasks = []
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def warmup_task(f):
+    """Register ``f(app)`` to run during warm-up, in registration order."""
+    _warmup_tasks.append(f)
+    return f
+
+
+@warmup_task
+def precompile_templates(app):
+    # Compiles every template once, which also fills the on-disk bytecode cache
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
+def run_warmup(app):
+    warmup_state['started_at'] = time.time()
+    start = time.perf_counter()
+    for task in _warmup_tasks:
+        try:
+            with app.app_context():
+                task(app)
+        except Exception:
+            # A broken task should not keep the worker out of rotation forever
+            logging.exception(f"[run_warmup] Warm-up task '{task.__name__}' failed")
+            warmup_state['failed_tasks'].append(task.__name__)
+    warmup_state['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    warmup_state['ready'] = True
+    logging.info(f"[run_warmup] Worker ready after {warmup_state['duration_ms']} ms")
+
+
+def start_warmup(app):
+    """Start warm-up in a background thread, once per process.
+
+    A process forked from one that had already started it (``gunicorn
+    --preload``) starts it again itself; threads do not survive a fork.
+    """
+    global _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+        warmup_state.update(ready=False, started_at=None, duration_ms=None, failed_tasks=[])
+    threading.Thread(target=run_warmup, args=(app,), name='warmup', daemon=True).start()
+
+
+def init_warmup(app):
+    """Enable the Jinja bytecode cache, add /readyz and start warm-up if configured.
+
+    Call it once every route and warm-up task is registered: warm-up starts
+    right away, while the worker boots, not on its first request.
+    """
+    cache_dir = app.config.get('JINJA_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    @app.route('/readyz')
+    def readyz():
+        """Readiness probe: 503 until warm-up has finished."""
+        return jsonify(warmup_state), 200 if warmup_state['ready'] else 503
+
+    if app.config.get('WARMUP_ON_START'):
+        start_warmup(app)
+        # Under --preload this import ran in the master; each forked worker warms up its own copy
+        os.register_at_fork(after_in_child=lambda: start_warmup(app))
+    else:
+        warmup_state['ready'] = True
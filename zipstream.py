@@ -0,0 +1,56 @@
+import io
+import time
+import zipfile
+
+# Formats that are already compressed; deflating them again only burns CPU
+STORED_EXTENSIONS = {
+    'pdf', 'docx', 'pptx', 'xlsx', 'zip', 'gz', '7z', 'rar',
+    'jpg', 'jpeg', 'png', 'gif', 'mp3', 'mp4', 'm4a', 'mkv', 'mov', 'webm',
+}
+CHUNK_SIZE = 256 * 1024
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, unseekable file object that hands written bytes back to the caller."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def stream_zip(files):
+    """Generate a ZIP archive chunk by chunk.
+
+    ``files`` yields (arcname, size, mtime, open_file) tuples, where
+    ``open_file()`` returns a readable binary file object. Nothing is buffered
+    beyond one read chunk and nothing is written to disk: the archive uses data
+    descriptors, so entry sizes and CRCs follow the data.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for arcname, size, mtime, open_file in files:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(mtime, 315532800))[:6])
+            # Lets zipfile pick ZIP64 headers up front for files over 4 GiB
+            info.file_size = size
+            extension = arcname.rsplit('.', 1)[-1].lower() if '.' in arcname else ''
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            with open_file() as src, archive.open(info, 'w') as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    yield from sink.drain()
+            yield from sink.drain()
+    # Central directory
+    yield from sink.drain()